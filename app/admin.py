@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, Header, Query
+import hmac
+from utils.ClassQueryStats import query_stats
+from utils.ClassConfig import settings, logger_config
+from utils.ClassException import Unauthorized
+
+logger = logger_config.get_logger(__name__)
+
+
+async def require_admin_token(x_admin_token: str | None = Header(None)):
+    """Доступ к /admin только с токеном ADMIN_TOKEN в заголовке X-Admin-Token"""
+    if not settings.ADMIN_TOKEN or not hmac.compare_digest(
+        (x_admin_token or "").encode(), settings.ADMIN_TOKEN.encode()
+    ):
+        raise Unauthorized("Неверный или отсутствующий X-Admin-Token")
+
+
+# Подключается в app/main.py, только если задан ADMIN_TOKEN
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin_token)])
+
+
+@router.get("/query-stats")
+async def get_query_stats(
+    order_by: str = Query("total_ms", pattern="^(calls|total_ms|mean_ms|p95_ms|max_ms|rows|errors)$"),
+    limit: int = Query(50, ge=1, le=1000),
+):
+    """Статистика SQL-запросов по отпечаткам (сортировка по убыванию order_by)."""
+    logger.debug("Запущен ендпоинт: get_query_stats")
+    return query_stats.snapshot(order_by=order_by, limit=limit)
+
+
+@router.post("/query-stats/reset")
+async def reset_query_stats():
+    """Сброс статистики SQL-запросов."""
+    logger.debug("Запущен ендпоинт: reset_query_stats")
+    query_stats.reset()
+    return {"status": "ok"}
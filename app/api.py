@@ -1,38 +1,305 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db
+from app.database import get_db, get_session, async_session_factory, admission, engine, replica_engines, driver_dsn
 from typing import List
-from utils.ClassSQL import DBQueries
+import asyncio
+from datetime import datetime
+from utils.ClassSQL import DBQueries, StatementRegistry
 from utils.ClassError import ErrorHandler
 from app import schemas as incident_schemas
 from typing import Dict
 from app import crud as incident_crud
-from utils.ClassConfig import logger_config
+from app.dedup import IncidentDeduplicator
+from app.ingest import IncidentWriteBehind
+from app.events import RESET, IncidentEvent, IncidentEventHub
+from utils.ClassConfig import logger_config, settings
+from utils.ClassException import BadRequest, ServiceUnavailable
+from utils.ClassETag import DataVersion, conditional_requests, etag_matches
 
 logger = logger_config.get_logger(__name__)
 error_handler = ErrorHandler(logger)
-queries = DBQueries(error_handler)
+queries = DBQueries(
+    error_handler,
+    StatementRegistry(cache_size=settings.DB_STATEMENT_CACHE_SIZE),
+    slow_query_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    slow_query_logger=logger_config.get_file_logger("slow_queries", settings.SLOW_QUERY_LOG_FILE),
+    explain_slow_queries=settings.SLOW_QUERY_EXPLAIN,
+    explain_interval=settings.SLOW_QUERY_EXPLAIN_INTERVAL,
+)
 
-service = incident_crud.IncidentService(queries, logger=logger)
+# Окно дедупликации повторов (только для источников из INCIDENTS_DEDUP_SOURCES)
+dedup = IncidentDeduplicator(
+    engine,
+    window=settings.INCIDENTS_DEDUP_WINDOW,
+    maxsize=settings.INCIDENTS_DEDUP_CACHE_SIZE,
+    logger=logger,
+) if settings.INCIDENTS_DEDUP_SOURCES else None
+
+# Лента изменений: одно соединение LISTEN на процесс для всех подписчиков SSE и WebSocket
+events = IncidentEventHub(
+    driver_dsn(engine),
+    history=settings.INCIDENTS_STREAM_HISTORY,
+    buffer_size=settings.INCIDENTS_STREAM_CLIENT_BUFFER,
+    max_subscribers=settings.INCIDENTS_STREAM_MAX_CLIENTS,
+    logger=logger,
+)
+
+# Версия данных для ETag — номер последнего уведомления ленты, одинаковый во всех процессах,
+# поэтому без соединения LISTEN ETag не выдаются; с репликами — не раньше HTTP_ETAG_SETTLE_SECONDS после изменения
+data_version = DataVersion(
+    settle=settings.HTTP_ETAG_SETTLE_SECONDS if replica_engines else 0.0,
+    enabled=lambda: settings.HTTP_ETAG_ENABLED,
+    shared=lambda: events.version,
+)
+
+service = incident_crud.IncidentService(queries, logger=logger, dedup=dedup, version=data_version)
+
+
+def incidents_changed(event: IncidentEvent) -> None:
+    """Изменение из ленты; для RESET и invalidate без ids неизвестно, какие инциденты изменились"""
+    if event.type == "invalidate":
+        service.data_changed(ids=event.ids, reset=event.ids is None)
+    else:
+        service.data_changed(event.incident, reset=event is RESET)
+
+
+events.on_change(incidents_changed)
 router = APIRouter(prefix="/incidents", tags=["incidents"])
 
-@router.post("", response_model=incident_schemas.IncidentOut)
-async def create_incident(payload: incident_schemas.IncidentCreate, db: AsyncSession = Depends(get_db)):
-    logger.debug(f"Запущен ендпоинт: create_incident")
+
+async def _write_queued(payloads: list[incident_schemas.IncidentCreate]) -> list[dict]:
+    """Запись пакета из очереди отложенной записи в отдельной сессии"""
+    async with async_session_factory() as db:
+        return await service.create_incidents_batch(db, payloads)
+
+
+# Очередь отложенной записи: POST /incidents отвечает 202, инциденты пишутся пакетами
+write_behind = IncidentWriteBehind(
+    _write_queued,
+    maxsize=settings.INCIDENTS_ASYNC_QUEUE_SIZE,
+    batch_size=settings.INCIDENTS_ASYNC_BATCH_SIZE,
+    flush_interval=settings.INCIDENTS_ASYNC_FLUSH_MS / 1000,
+    logger=logger,
+)
+
+
+def _conditional(route: str, if_none_match: str | None, *parts) -> tuple[str | None, Response | None]:
+    """ETag ответа для текущей версии данных и готовый 304, если клиент прислал тот же ETag"""
+    etag = data_version.etag(route, *parts)
+    if etag is None:
+        return None, None
+    if etag_matches(if_none_match, etag):
+        conditional_requests.inc(route=route, result="not_modified")
+        return etag, Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    if if_none_match:
+        conditional_requests.inc(route=route, result="modified")
+    return etag, None
+
+
+def _etag_headers(etag: str | None) -> dict | None:
+    return {"ETag": etag, "Cache-Control": "no-cache"} if etag else None
+
+
+def _respond_async(payload: incident_schemas.IncidentCreate, prefer: str | None) -> bool:
+    """
+    Отложенная запись: для источников из INCIDENTS_ASYNC_SOURCES или по заголовку Prefer: respond-async.
+    Источники с дедупликацией пишутся синхронно — повторы и так поглощает окно дедупликации.
+    """
+    if payload.source in settings.INCIDENTS_DEDUP_SOURCES:
+        return False
+    if payload.source in settings.INCIDENTS_ASYNC_SOURCES:
+        return True
+    return prefer is not None and "respond-async" in (token.strip().lower() for token in prefer.split(","))
+
+@router.post(
+    "",
+    response_model=incident_schemas.IncidentOut,
+    responses={202: {"model": incident_schemas.IncidentAccepted, "description": "Инцидент принят в очередь записи"}},
+)
+async def create_incident(
+    payload: incident_schemas.IncidentCreate,
+    prefer: str | None = Header(None),
+    db: AsyncSession = Depends(get_session),
+):
+    logger.debug("Запущен ендпоинт: create_incident")
+    if _respond_async(payload, prefer):
+        ticket = write_behind.submit(payload)
+        return JSONResponse(
+            status_code=202,
+            content=incident_schemas.IncidentAccepted(ticket=ticket).model_dump(),
+            headers={"Preference-Applied": "respond-async"} if prefer and "respond-async" in prefer.lower() else None,
+        )
+
+    # admission control — только для синхронной записи: 202 не обращается к БД
+    admission.check()
     incident = await service.create_incident(db, payload)
     return incident_schemas.IncidentOut.model_validate(incident)
 
-@router.get("", response_model=List[incident_schemas.IncidentOut])
-async def list_incidents(status: str | None = None, db: AsyncSession = Depends(get_db)):
-    logger.debug(f"Запущен ендпоинт: list_incidents")
-    return await service.list_incidents(db, status)
+@router.post("/batch", response_model=List[incident_schemas.IncidentOut])
+async def create_incidents_batch(
+    payload: List[incident_schemas.IncidentCreate] = Body(
+        ..., min_length=1, max_length=settings.INCIDENTS_BATCH_MAX_SIZE
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    logger.debug("Запущен ендпоинт: create_incidents_batch")
+    return await service.create_incidents_batch(db, payload)
+
+@router.get("", response_model=incident_schemas.IncidentPage)
+async def list_incidents(
+    status: str | None = None,
+    limit: int = Query(settings.INCIDENTS_PAGE_DEFAULT_LIMIT, ge=1),
+    cursor: str | None = None,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_session),
+):
+    logger.debug("Запущен ендпоинт: list_incidents")
+    # If-None-Match проверяется до admission control: 304 не обращается к БД
+    etag, not_modified = _conditional("list_incidents", if_none_match, status, limit, cursor)
+    if not_modified:
+        return not_modified
+
+    admission.check()
+    page = await service.list_incidents(db, status, limit=limit, cursor=cursor)
+    # response_model остаётся для схемы OpenAPI, а JSON собирается напрямую из строк БД
+    return Response(
+        content=incident_schemas.dump_incident_page(page), media_type="application/json", headers=_etag_headers(etag)
+    )
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_incidents(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    status: str | None = None,
+):
+    logger.debug("Запущен ендпоинт: export_incidents")
+    admission.check()
+
+    async def content():
+        # Сессия живёт столько же, сколько поток ответа
+        async with async_session_factory() as db:
+            async for chunk in service.export_incidents(db, fmt, status):
+                yield chunk
+
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="incidents.{fmt}"'}
+    return StreamingResponse(content(), media_type=media_type, headers=headers)
+
+@router.get("/search", response_model=incident_schemas.IncidentSearchPage)
+async def search_incidents(
+    q: str = Query(..., min_length=1, max_length=256),
+    status: str | None = None,
+    source: str | None = None,
+    limit: int = Query(settings.INCIDENTS_PAGE_DEFAULT_LIMIT, ge=1),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    logger.debug("Запущен ендпоинт: search_incidents")
+    page = await service.search_incidents(db, q, status, source, limit=limit, cursor=cursor)
+    return Response(content=incident_schemas.dump_search_page(page), media_type="application/json")
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_incidents(
+    status: str | None = None,
+    last_event_id: str | None = Query(None, description="Продолжить после события (или заголовок Last-Event-ID)"),
+    last_event_id_header: str | None = Header(None, alias="Last-Event-ID"),
+):
+    """Лента созданий и смен статуса инцидентов (Server-Sent Events)"""
+    logger.debug("Запущен ендпоинт: stream_incidents")
+    resume = last_event_id or last_event_id_header
+    if resume is not None and not resume.isdigit():
+        raise BadRequest("Некорректный Last-Event-ID", field="last_event_id")
+    subscription = events.subscribe(int(resume) if resume else None, status)
+    if subscription is None:
+        raise ServiceUnavailable("Слишком много подписчиков ленты, повторите позже", retry_after=5)
+
+    async def content():
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                event = await subscription.next(settings.INCIDENTS_STREAM_HEARTBEAT)
+                if subscription.closed:
+                    break
+                yield event.sse if event is not None else b": heartbeat\n\n"
+        finally:
+            events.unsubscribe(subscription)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(content(), media_type="text/event-stream", headers=headers)
+
+@router.websocket("/stream/ws")
+async def stream_incidents_ws(websocket: WebSocket, status: str | None = None, last_event_id: int | None = None):
+    """Лента созданий и смен статуса инцидентов (WebSocket, сообщения JSON)"""
+    subscription = events.subscribe(last_event_id, status)
+    if subscription is None:
+        await websocket.close(code=1013)     # try again later
+        return
+
+    async def watch_disconnect():
+        # сообщения клиента не нужны; отключение будит ожидание следующего события
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+        subscription.close("disconnected")
+
+    await websocket.accept()
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        while True:
+            event = await subscription.next(settings.INCIDENTS_STREAM_HEARTBEAT)
+            if subscription.closed == "disconnected":
+                break
+            if subscription.closed:
+                await websocket.close(code=1013 if subscription.closed == "slow" else 1001)
+                break
+            await websocket.send_text(event.message if event is not None else '{"type":"heartbeat"}')
+    except WebSocketDisconnect:
+        pass
+    finally:
+        watcher.cancel()
+        events.unsubscribe(subscription)
 
 @router.patch("/{incident_id}/status", response_model=incident_schemas.IncidentOut)
 async def update_incident_status(incident_id: int, data: incident_schemas.IncidentUpdateStatus, db: AsyncSession = Depends(get_db)):
-    logger.debug(f"Запущен ендпоинт: update_incident_status")
+    logger.debug("Запущен ендпоинт: update_incident_status")
     return await service.update_status(db, incident_id, data.status)
 
 @router.get("/monitoring", response_model=Dict[str, int])
-async def monitoring_errors(db: AsyncSession = Depends(get_db)):
-    logger.debug(f"Запущен ендпоинт: monitoring_errors")
-    return await service.get_error_stats(db)
+async def monitoring_errors(
+    by: str = Query("status", pattern="^(status|source)$"),
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_session),
+):
+    logger.debug("Запущен ендпоинт: monitoring_errors")
+    # If-None-Match проверяется до admission control: 304 не обращается к БД
+    etag, not_modified = _conditional("monitoring_errors", if_none_match, by)
+    if not_modified:
+        return not_modified
+
+    admission.check()
+    stats = await service.get_error_stats(db, by)
+    return JSONResponse(content=stats, headers=_etag_headers(etag))
+
+@router.get("/stats/timeseries", response_model=List[incident_schemas.TimeseriesPoint])
+async def incidents_timeseries(
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    bucket: str = Query("hour", pattern="^(hour|day)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Число инцидентов по корзинам, источнику и текущему статусу из агрегатов incident_rollups.
+    Дни старше ROLLUP_HOURLY_RETENTION_DAYS заморожены на момент сворачивания: смена статуса
+    старого инцидента в них не отражается.
+    """
+    logger.debug("Запущен ендпоинт: incidents_timeseries")
+    return await service.get_timeseries(db, start, end, bucket)
+
+# Объявлен последним: иначе /{incident_id} перехватит GET /stream, /search и т.п.
+@router.get("/{incident_id}", response_model=incident_schemas.IncidentOut)
+async def get_incident(incident_id: int, db: AsyncSession = Depends(get_db)):
+    logger.debug("Запущен ендпоинт: get_incident")
+    incident = await service.get_incident(db, incident_id)
+    return Response(
+        content=incident_schemas.incident_row_adapter.dump_json(incident_schemas.to_incident_row(incident)),
+        media_type="application/json",
+    )
@@ -1,108 +1,625 @@
-from typing import List
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 from sqlalchemy.ext.asyncio import AsyncSession
 from utils.ClassSQL import DBQueries
-from app.schemas import IncidentCreate
-from utils.ClassException import AppException
+from utils.ClassConfig import settings
+from app.schemas import IncidentCreate, incident_row_adapter, incident_rows_adapter, to_incident_row
+from app.dedup import IncidentDeduplicator, absorbed_total, fingerprint
+from utils.ClassException import AppException, BadRequest, ConflictData, NotFound
+from utils.ClassCache import TTLCache
+from utils.ClassETag import DataVersion
 import logging
+import base64
+import json
+import csv
+import io
+
+# Колонки, которые отдаются клиенту (вместо SELECT *)
+INCIDENT_COLUMNS = "id, description, status, source, created_at, occurrences, last_seen_at"
+
+# Горячие запросы сервиса: выполняются как prepared statements через DBQueries.run_named
+STATEMENTS = {
+    "incident_insert": f"""
+        INSERT INTO incidents (description, status, source)
+        VALUES (:description, :status, :source)
+        RETURNING {INCIDENT_COLUMNS}
+    """,
+    # Дедупликация: отпечаток открытого инцидента захватывается в incident_fingerprints через
+    # INSERT ... ON CONFLICT. Новый отпечаток создаёт инцидент с заранее выданным id, известный —
+    # увеличивает occurrences у открытого инцидента. Пустой результат — отпечаток указывает
+    # на уже решённый инцидент (см. incident_fingerprint_release_stale).
+    "incident_dedup": f"""
+        WITH claim AS (
+            INSERT INTO incident_fingerprints (fingerprint, incident_id, incident_created_at)
+            VALUES (:fingerprint, nextval(pg_get_serial_sequence('incidents', 'id')), now())
+            ON CONFLICT (fingerprint) DO UPDATE SET fingerprint = EXCLUDED.fingerprint
+            RETURNING incident_id, incident_created_at, (xmax = 0) AS claimed
+        ), inserted AS (
+            INSERT INTO incidents (id, description, status, source, created_at, fingerprint, last_seen_at)
+            SELECT incident_id, :description, :status, :source, incident_created_at, :fingerprint, incident_created_at
+            FROM claim WHERE claimed
+            RETURNING {INCIDENT_COLUMNS}
+        ), updated AS (
+            UPDATE incidents SET occurrences = occurrences + 1, last_seen_at = now()
+            FROM claim
+            WHERE NOT claimed AND id = incident_id AND created_at = incident_created_at AND status <> 'resolved'
+            RETURNING {INCIDENT_COLUMNS}
+        )
+        SELECT * FROM inserted UNION ALL SELECT * FROM updated
+    """,
+    "incident_fingerprint_release_stale": """
+        DELETE FROM incident_fingerprints f
+        WHERE fingerprint = :fingerprint AND NOT EXISTS (
+            SELECT 1 FROM incidents i
+            WHERE i.id = f.incident_id AND i.created_at = f.incident_created_at AND i.status <> 'resolved'
+        )
+    """,
+    "incident_get": f"""
+        SELECT {INCIDENT_COLUMNS} FROM incidents WHERE id = :id
+    """,
+    "incident_update_status": f"""
+        UPDATE incidents SET status = :status WHERE id = :id
+        RETURNING {INCIDENT_COLUMNS}
+    """,
+    "incident_counters": """
+        SELECT key, count
+        FROM incident_counters
+        WHERE dimension = :dimension AND count > 0
+    """,
+    # Временные ряды читаются только из агрегатов incident_rollups (см. app/rollups.py)
+    "incident_timeseries_hour": """
+        SELECT bucket, source, status, count
+        FROM incident_rollups
+        WHERE granularity = 'hour' AND bucket >= :start AND bucket < :end
+        ORDER BY bucket, source, status
+    """,
+    "incident_timeseries_day": """
+        SELECT date_trunc('day', bucket, :tz) AS bucket, source, status, SUM(count)::BIGINT AS count
+        FROM incident_rollups
+        WHERE granularity IN ('hour', 'day') AND bucket >= :start AND bucket < :end
+        GROUP BY 1, source, status
+        ORDER BY 1, source, status
+    """,
+}
+
+# Длительность корзины временного ряда
+TIMESERIES_BUCKETS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+
+def _page_statement(with_status: bool, with_cursor: bool) -> tuple[str, str]:
+    """Имя и текст запроса страницы списка для данного набора фильтров"""
+    name = "incidents_page" + ("_status" if with_status else "") + ("_after" if with_cursor else "")
+    conditions = []
+    if with_status:
+        conditions.append("status = :status")
+    if with_cursor:
+        conditions.append("(created_at, id) < (:cursor_created_at, :cursor_id)")
+
+    query = f"SELECT {INCIDENT_COLUMNS} FROM incidents"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY created_at DESC, id DESC LIMIT :limit"
+    return name, query
+
+
+STATEMENTS.update(
+    _page_statement(with_status, with_cursor) for with_status in (False, True) for with_cursor in (False, True)
+)
+
+def _search_statement(with_status: bool, with_source: bool, with_cursor: bool) -> tuple[str, str]:
+    """
+    Имя и текст запроса полнотекстового поиска для данного набора фильтров.
+    Совпадения находятся по GIN-индексу search_vector; ранжируются ts_rank только :max_candidates
+    самых новых из них, поэтому стоимость широкого запроса ограничена, а не растёт с числом совпадений.
+    Keyset-пагинация по (rank, created_at, id) от более релевантных к менее.
+    """
+    name = (
+        "incidents_search"
+        + ("_status" if with_status else "")
+        + ("_source" if with_source else "")
+        + ("_after" if with_cursor else "")
+    )
+    conditions = ["search_vector @@ search_query"]
+    if with_status:
+        conditions.append("status = :status")
+    if with_source:
+        conditions.append("source = :source")
+
+    query = f"""
+        SELECT {INCIDENT_COLUMNS}, rank FROM (
+            SELECT {INCIDENT_COLUMNS}, ts_rank(search_vector, search_query) AS rank
+            FROM incidents, websearch_to_tsquery('russian', :q) AS search_query
+            WHERE {" AND ".join(conditions)}
+            ORDER BY created_at DESC, id DESC
+            LIMIT :max_candidates
+        ) matches
+    """
+    if with_cursor:
+        query += (
+            " WHERE (rank, created_at, id)"
+            " < (CAST(:cursor_rank AS REAL), :cursor_created_at, :cursor_id)"
+        )
+    query += " ORDER BY rank DESC, created_at DESC, id DESC LIMIT :limit"
+    return name, query
+
+
+STATEMENTS.update(
+    _search_statement(with_status, with_source, with_cursor)
+    for with_status in (False, True) for with_source in (False, True) for with_cursor in (False, True)
+)
+
+# Поля выгрузки в CSV (в порядке колонок)
+EXPORT_FIELDS = [
+    "id", "description", "status", "source", "created_at", "occurrences", "last_seen_at", "created_at_local",
+]
+
+
+def _encode_cursor(created_at: datetime, incident_id: int) -> str:
+    """Непрозрачный курсор пагинации из (created_at, id) последней строки страницы"""
+    raw = json.dumps([created_at.isoformat(), incident_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Разбор курсора пагинации; некорректный курсор — ошибка 400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, incident_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(incident_id)
+    except Exception:
+        raise BadRequest("Некорректный курсор пагинации", field="cursor")
+
+
+def _encode_search_cursor(rank: float, created_at: datetime, incident_id: int) -> str:
+    """Курсор поиска из (rank, created_at, id) последней строки страницы"""
+    raw = json.dumps([rank, created_at.isoformat(), incident_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_search_cursor(cursor: str) -> tuple[float, datetime, int]:
+    """Разбор курсора поиска; некорректный курсор — ошибка 400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        rank, created_at, incident_id = json.loads(raw)
+        return float(rank), datetime.fromisoformat(created_at), int(incident_id)
+    except Exception:
+        raise BadRequest("Некорректный курсор поиска", field="cursor")
+
+
+def _csv_lines(rows) -> str:
+    """Форматирует строки в CSV-текст"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
 
 class IncidentService:
     """CRUD-сервис для работы с инцидентами"""
 
-    def __init__(self, queries: DBQueries, logger: logging.Logger):
+    def __init__(
+        self,
+        queries: DBQueries,
+        logger: logging.Logger,
+        dedup: IncidentDeduplicator | None = None,
+        version: DataVersion | None = None,
+    ):
         self.queries = queries
         self.logger = logger
+        self.dedup = dedup
+        # версия данных для ETag (общая для процессов, см. utils/ClassETag.py)
+        self.version = version or DataVersion()
+        for name, query in STATEMENTS.items():
+            self.queries.statements.register(name, query)
+        # кэш статистики: ключ — разрез ("status" или "source")
+        self.stats_cache = TTLCache(maxsize=8, ttl=settings.MONITORING_CACHE_TTL)
+        # кэш инцидентов по id для GET /incidents/{id}
+        self.incident_cache = TTLCache(maxsize=settings.INCIDENTS_CACHE_SIZE, ttl=settings.INCIDENTS_CACHE_TTL)
+        # id -> маркер текущего чтения из БД; инвалидация снимает маркер, и прочитанное не кэшируется
+        self._loads: dict[int, object] = {}
+
+    def data_written(self, seen: str | None) -> None:
+        """
+        Запись через сервис зафиксирована: метка версии для ETag до прихода уведомления о ней
+        и сброс кэша статистики. seen — общая версия, прочитанная до начала записи.
+        """
+        self.version.bump(seen)
+        self.stats_cache.clear()
+
+    def data_changed(self, incident: dict | None = None, ids: list[int] | None = None, reset: bool = False) -> None:
+        """
+        Изменение incidents из ленты: новая версия для ETag и сброс кэша статистики.
+        incident — новое состояние изменённого инцидента (обновляет его запись в кэше, если она есть);
+        ids — инциденты, изменённые без нового состояния (удалённые, повторы дедупликации), убираются из кэша;
+        reset — неизвестно, какие инциденты изменились, кэш инцидентов сбрасывается целиком.
+        """
+        self.version.changed()
+        self.stats_cache.clear()
+        if incident is not None:
+            self._cache_incident(incident)
+        for incident_id in ids or ():
+            self.incident_cache.pop(incident_id)
+            self._loads.pop(incident_id, None)
+        if reset:
+            self.incident_cache.clear()
+            self._loads.clear()
+
+    def _cache_incident(self, incident: dict) -> None:
+        """
+        Свежее состояние инцидента в кэш, только если он уже закэширован: записи не вытесняют
+        из LRU инциденты, которые читают (кэш заполняют только чтения GET /incidents/{id})
+        """
+        self._loads.pop(incident["id"], None)
+        if incident["id"] in self.incident_cache:
+            self.incident_cache.set(incident["id"], incident)
 
     async def create_incident(self, db: AsyncSession, payload: IncidentCreate) -> dict:
         """Создание нового инцидента"""
         try:
-            params = payload.model_dump()
+            params = payload.model_dump(mode="json")
             params['status'] = "new"
-            self.logger.info(f"Запуск функции create_incident с параметрами: {payload}")
-
-            query = """
-            INSERT INTO incidents (description, status, source)
-            VALUES (:description, :status, :source)
-            RETURNING id
-            """
-            inserted_id = await self.queries.run_insert(
-                db, query, params=params, commit=True, return_id=True
-            )
+            self.logger.info("Запуск функции create_incident с параметрами: %s", payload)
 
-            incident = await self.queries.run_select(
-                db,
-                "SELECT * FROM incidents WHERE id = :id",
-                params={"id": inserted_id},
-                mode="mappings_first",
-                required=True
+            if self.dedup is not None and params["source"] in settings.INCIDENTS_DEDUP_SOURCES:
+                return await self._create_deduplicated(db, params)
+
+            seen = self.version.shared()
+            incident = await self.queries.run_named(
+                db, "incident_insert", params=params, mode="mappings_first", commit=True
             )
+            self.data_written(seen)
+            self._cache_incident(incident)
 
-            self.logger.info(f"Инцидент создан: {incident}")
+            self.logger.info("Инцидент создан: %s", incident)
             return incident
         except Exception as e:
             await self.queries.error_handler.handle_client_error(e, context="create_incident")
             raise
 
-    async def list_incidents(self, db: AsyncSession, status_filter: str | None = None) -> List[dict]:
-        """Получение списка инцидентов (опционально по статусу)"""
+    async def _create_deduplicated(self, db: AsyncSession, params: dict) -> dict:
+        """
+        Создание инцидента с дедупликацией: повтор открытого инцидента с тем же отпечатком
+        поглощается окном в памяти процесса или увеличивает occurrences в БД.
+        """
+        key = fingerprint(params["description"], params["source"])
+        incident = self.dedup.absorb(key)
+        if incident is not None:
+            return incident
+
+        seen = self.version.shared()
+        incident = await self._deduplicate(db, params, key, commit=True)
+        self.data_written(seen)
+        self._cache_incident(incident)
+        self._remember_deduplicated(key, incident)
+        return incident
+
+    async def _deduplicate(self, db: AsyncSession, params: dict, key: str, commit: bool) -> dict:
+        """Вставка инцидента или увеличение occurrences открытого инцидента с отпечатком key в БД"""
+        params = dict(params, fingerprint=key)
+        for _ in range(3):
+            incident = await self.queries.run_named(
+                db, "incident_dedup", params=params, mode="mappings_first", commit=commit
+            )
+            if incident:
+                return incident
+            # отпечаток указывает на решённый инцидент (или видим не тот снимок) — освобождаем и повторяем
+            await self.queries.run_named(
+                db, "incident_fingerprint_release_stale", params={"fingerprint": key}, commit=commit
+            )
+        raise ConflictData("Не удалось создать инцидент: конфликт дедупликации")
+
+    def _remember_deduplicated(self, key: str, incident: dict) -> None:
+        """Открывает окно дедупликации для инцидента, записанного в БД"""
+        if incident["occurrences"] > 1:
+            absorbed_total.inc(where="db")
+            self.logger.info("Повтор инцидента %s, повторов: %s", incident["id"], incident["occurrences"])
+        else:
+            self.logger.info("Инцидент создан: %s", incident)
+        self.dedup.remember(key, incident)
+
+    async def create_incidents_batch(self, db: AsyncSession, payloads: list[IncidentCreate]) -> list[dict]:
+        """
+        Создание пакета инцидентов в одной транзакции.
+        Инциденты источников INCIDENTS_DEDUP_SOURCES проходят дедупликацию в БД по одному
+        (в той же транзакции, после вставки остальных; окно в памяти процесса повторы пакета
+        не поглощает, чтобы откат пакета не оставлял в нём повторов).
+        Возвращает созданные инциденты в порядке входного списка.
+        """
         try:
-            self.logger.info(f"Запуск функции list_incidents с фильтром: {status_filter}")
-            query = "SELECT * FROM incidents"
-            params = {}
-            if status_filter:
-                query += " WHERE status = :status"
-                params["status"] = status_filter
+            rows = [dict(payload.model_dump(mode="json"), status="new") for payload in payloads]
+            self.logger.info("Запуск функции create_incidents_batch, инцидентов: %s", len(rows))
+
+            deduplicated = {
+                position for position, row in enumerate(rows)
+                if self.dedup is not None and row["source"] in settings.INCIDENTS_DEDUP_SOURCES
+            }
+            plain = [row for position, row in enumerate(rows) if position not in deduplicated]
+
+            incidents: list[dict | None] = [None] * len(rows)
+            seen = self.version.shared()
+            keys = {position: fingerprint(rows[position]["description"], rows[position]["source"])
+                    for position in deduplicated}
+            await self.queries.begin(db)
+            inserted = iter(await self._insert_batch(db, plain) if plain else [])
+            for position in range(len(rows)):
+                if position not in deduplicated:
+                    incidents[position] = next(inserted)
+            for position in sorted(deduplicated):
+                incidents[position] = await self._deduplicate(db, rows[position], keys[position], commit=False)
+            await db.commit()
+
+            self.data_written(seen)
+            for incident in incidents:
+                self._cache_incident(incident)
+            for position in sorted(deduplicated):
+                self._remember_deduplicated(keys[position], incidents[position])
 
-            incidents = await self.queries.run_select(
-                db, query, params=params, mode="mappings_all"
+            self.logger.info("Пакет инцидентов создан, инцидентов: %s", len(incidents))
+            return incidents
+        except Exception as e:
+            await self.queries.error_handler.handle_client_error(e, context="create_incidents_batch")
+            raise
+
+    async def _insert_batch(self, db: AsyncSession, rows: list[dict]) -> list[dict]:
+        """
+        Вставка пакета без дедупликации в транзакции сессии (фиксирует вызывающий):
+        COPY для больших пакетов, иначе INSERT ... VALUES
+        """
+        if len(rows) >= settings.INCIDENTS_BATCH_COPY_THRESHOLD:
+            # Для больших пакетов: резервируем id и время одним запросом, затем COPY
+            allocated = await self.queries.run_select(
+                db,
+                """
+                SELECT nextval(pg_get_serial_sequence('incidents', 'id')) AS id, now() AS created_at
+                FROM generate_series(1, :count)
+                """,
+                params={"count": len(rows)},
+                mode="mappings_all",
+                use_primary=True,       # nextval — запись, на реплике невозможна
+            )
+            incidents = [
+                {"id": ids["id"], **row, "created_at": ids["created_at"], "occurrences": 1, "last_seen_at": None}
+                for ids, row in zip(allocated, rows)
+            ]
+            columns = ["id", "description", "status", "source", "created_at"]
+            await self.queries.run_copy(
+                db,
+                "incidents",
+                columns=columns,
+                records=[tuple(incident[column] for column in columns) for incident in incidents],
+                commit=False,
             )
             return incidents
+
+        inserted = await self.queries.run_insert_many(
+            db, "incidents", rows, returning=INCIDENT_COLUMNS, commit=False
+        )
+        # id выдаются последовательностью в порядке строк VALUES
+        return sorted(inserted, key=lambda incident: incident["id"])
+
+    async def list_incidents(
+        self,
+        db: AsyncSession,
+        status_filter: str | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> dict:
+        """
+        Получение страницы инцидентов (опционально по статусу).
+        Keyset-пагинация по (created_at, id) от новых к старым.
+        """
+        limit = min(limit or settings.INCIDENTS_PAGE_DEFAULT_LIMIT, settings.INCIDENTS_PAGE_MAX_LIMIT)
+        after = _decode_cursor(cursor) if cursor else None
+        try:
+            self.logger.info("Запуск функции list_incidents с фильтром: %s, limit: %s", status_filter, limit)
+
+            params = {"limit": limit + 1}  # +1 строка, чтобы понять, есть ли следующая страница
+            if status_filter:
+                params["status"] = status_filter
+            if after:
+                params["cursor_created_at"], params["cursor_id"] = after
+            name, _ = _page_statement(bool(status_filter), bool(after))
+
+            rows = await self.queries.run_named(db, name, params=params, mode="mappings_all")
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+            return {"items": rows, "next_cursor": next_cursor}
         except Exception as e:
             await self.queries.error_handler.handle_client_error(e, context="list_incidents")
             raise
 
-    async def update_status(self, db: AsyncSession, incident_id: int, status: str) -> dict:
-        """Обновление статуса инцидента"""
-        incident = await self.queries.run_select(
-            db,
-            "SELECT * FROM incidents WHERE id = :id",
-            params={"id": incident_id},
-            mode="mappings_first"
-        )
+    async def search_incidents(
+        self,
+        db: AsyncSession,
+        q: str,
+        status_filter: str | None = None,
+        source_filter: str | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> dict:
+        """
+        Полнотекстовый поиск по описанию (синтаксис websearch: слова, "фраза", -исключение, or).
+        Результаты отсортированы по релевантности среди INCIDENTS_SEARCH_MAX_CANDIDATES самых новых
+        совпадений, keyset-пагинация через cursor.
+        """
+        limit = min(limit or settings.INCIDENTS_PAGE_DEFAULT_LIMIT, settings.INCIDENTS_PAGE_MAX_LIMIT)
+        after = _decode_search_cursor(cursor) if cursor else None
+        try:
+            self.logger.info(
+                "Запуск функции search_incidents: статус %s, источник %s, limit: %s", status_filter, source_filter, limit
+            )
+
+            params = {"q": q, "limit": limit + 1, "max_candidates": settings.INCIDENTS_SEARCH_MAX_CANDIDATES}
+            if status_filter:
+                params["status"] = status_filter
+            if source_filter:
+                params["source"] = source_filter
+            if after:
+                params["cursor_rank"], params["cursor_created_at"], params["cursor_id"] = after
+            name, _ = _search_statement(bool(status_filter), bool(source_filter), bool(after))
+
+            rows = await self.queries.run_named(db, name, params=params, mode="mappings_all")
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                next_cursor = _encode_search_cursor(last["rank"], last["created_at"], last["id"])
+            return {"items": rows, "next_cursor": next_cursor}
+        except Exception as e:
+            await self.queries.error_handler.handle_client_error(e, context="search_incidents")
+            raise
+
+    async def export_incidents(self, db: AsyncSession, fmt: str = "ndjson", status_filter: str | None = None):
+        """
+        Потоковая выгрузка инцидентов в формате ndjson или csv.
+        Асинхронный генератор строк: читает БД частями через серверный курсор.
+        """
+        self.logger.info("Запуск функции export_incidents: формат %s, фильтр: %s", fmt, status_filter)
+        query = f"SELECT {INCIDENT_COLUMNS} FROM incidents"
+        params = {}
+        if status_filter:
+            query += " WHERE status = :status"
+            params["status"] = status_filter
+        query += " ORDER BY created_at, id"
+
+        if fmt == "csv":
+            yield _csv_lines([EXPORT_FIELDS])
+
+        exported = 0
+        async for rows in self.queries.run_stream(
+            db, query, params=params, chunk_size=settings.EXPORT_CHUNK_SIZE
+        ):
+            items = [to_incident_row(row) for row in rows]
+            if fmt == "csv":
+                yield _csv_lines(
+                    [item[field] for field in EXPORT_FIELDS]
+                    for item in incident_rows_adapter.dump_python(items, mode="json")
+                )
+            else:
+                yield b"".join(incident_row_adapter.dump_json(item) + b"\n" for item in items)
+            exported += len(items)
+
+        self.logger.info("Выгрузка инцидентов завершена, строк: %s", exported)
+
+    async def get_incident(self, db: AsyncSession, incident_id: int) -> dict:
+        """
+        Инцидент по id. Читается через кэш incident_cache (LRU с TTL INCIDENTS_CACHE_TTL, промахи — с primary);
+        записи обновляются записями сервиса и событиями ленты из других процессов.
+        """
+        incident = self.incident_cache.get(incident_id)
+        if incident is not None:
+            return incident
+
+        token = self._loads[incident_id] = object()
+        try:
+            # кэш заполняется с primary: отстающая реплика вернула бы состояние до последней инвалидации
+            incident = await self.queries.run_named(
+                db, "incident_get", params={"id": incident_id}, mode="mappings_first", use_primary=True
+            )
+        finally:
+            current = self._loads.get(incident_id)
+            if current is token:
+                del self._loads[incident_id]
         if not incident:
-            raise AppException(f"Инцидент с id {incident_id} не найден", status_code=404)
+            raise NotFound(f"Инцидент с id {incident_id} не найден")
 
-        await self.queries.run_update(
-            db,
-            "UPDATE incidents SET status = :status WHERE id = :id",
-            params={"status": status, "id": incident_id},
-            commit=True
-        )
+        # за время чтения инцидент мог измениться — тогда прочитанное состояние не кэшируется
+        if current is token:
+            self.incident_cache.set(incident_id, incident)
+        return incident
 
-        incident = await self.queries.run_select(
+    async def update_status(self, db: AsyncSession, incident_id: int, status: str) -> dict:
+        """Обновление статуса инцидента"""
+        seen = self.version.shared()
+        incident = await self.queries.run_named(
             db,
-            "SELECT * FROM incidents WHERE id = :id",
-            params={"id": incident_id},
+            "incident_update_status",
+            params={"status": status, "id": incident_id},
             mode="mappings_first",
-            required=True
+            commit=True
         )
+        if not incident:
+            raise AppException(f"Инцидент с id {incident_id} не найден", status_code=404)
+        self.data_written(seen)
+        self._cache_incident(incident)
+        if self.dedup is not None and status == "resolved":
+            # решённый инцидент больше не поглощает повторы в этом процессе
+            self.dedup.forget(fingerprint(incident["description"], incident["source"]))
 
-        self.logger.info(f"Инцидент обновлён: {incident}")
+        self.logger.info("Инцидент обновлён: %s", incident)
         return incident
 
-    async def get_error_stats(self, db: AsyncSession) -> dict:
-        """Возвращает статистику инцидентов по статусам"""
+    async def get_error_stats(self, db: AsyncSession, by: str = "status") -> dict:
+        """
+        Возвращает статистику инцидентов по статусам (или по источникам, by="source").
+        Читает счётчики incident_counters, которые ведут триггеры, и кэширует ответ
+        на MONITORING_CACHE_TTL секунд.
+        """
+        stats = self.stats_cache.get(by)
+        if stats is not None:
+            return stats
+
         try:
-            self.logger.info("Запуск функции get_error_stats")
-            query = """
-            SELECT status, COUNT(*) AS count
-            FROM incidents
-            GROUP BY status
-            """
-            rows = await self.queries.run_select(db, query, mode="mappings_all")
-            stats = {row['status']: row['count'] for row in rows}
-
-            self.logger.info(f"Статистика ошибок: {stats}")
+            self.logger.info("Запуск функции get_error_stats по разрезу: %s", by)
+            rows = await self.queries.run_named(
+                db, "incident_counters", params={"dimension": by}, mode="mappings_all"
+            )
+            stats = {row['key']: row['count'] for row in rows}
+            self.stats_cache.set(by, stats)
+
+            self.logger.info("Статистика ошибок: %s", stats)
             return stats
         except Exception as e:
             await self.queries.error_handler.handle_client_error(e, context="get_error_stats")
-            raise
\ No newline at end of file
+            raise
+
+    @staticmethod
+    def _align(value: datetime, bucket: str, tz: ZoneInfo, up: bool = False) -> datetime:
+        """
+        Граница корзины для value: начало корзины, в которую оно попадает (up — начало следующей,
+        если value не на границе). Часы считаются в UTC, дни — по полуночи в часовом поясе tz.
+        """
+        if bucket == "day":
+            aligned = value.astimezone(tz).replace(hour=0, minute=0, second=0, microsecond=0)
+            if up and aligned != value:
+                # следующая полночь по часам tz (сутки при смене летнего времени не равны 24 часам)
+                aligned = (aligned + TIMESERIES_BUCKETS[bucket]).replace(hour=0)
+            return aligned
+        aligned = value.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        if up and aligned != value:
+            aligned += TIMESERIES_BUCKETS[bucket]
+        return aligned
+
+    async def get_timeseries(self, db: AsyncSession, start: datetime, end: datetime, bucket: str = "hour") -> list[dict]:
+        """
+        Число инцидентов по корзинам времени (час или день), источнику и текущему статусу.
+        Читает только агрегаты incident_rollups, поэтому стоимость зависит от числа корзин,
+        а не от числа инцидентов. Время без часового пояса считается временем приложения;
+        границы выравниваются по корзинам: start — вниз, end — вверх (end не включается),
+        то есть в ответ входят все корзины, пересекающие период.
+        Дни старше горизонта часовых агрегатов заморожены на момент сворачивания (см. IncidentRollups).
+        """
+        tz = ZoneInfo(settings.TIMEZONE)
+        start, end = (value if value.tzinfo else value.replace(tzinfo=tz) for value in (start, end))
+        start, end = self._align(start, bucket, tz), self._align(end, bucket, tz, up=True)
+        if end <= start:
+            raise BadRequest("Конец периода должен быть позже начала", field="to")
+        if (end - start) / TIMESERIES_BUCKETS[bucket] > settings.INCIDENTS_TIMESERIES_MAX_BUCKETS:
+            raise BadRequest(
+                f"Слишком много корзин, максимум {settings.INCIDENTS_TIMESERIES_MAX_BUCKETS}", field="bucket"
+            )
+
+        try:
+            self.logger.info("Запуск функции get_timeseries: %s - %s по %s", start, end, bucket)
+            params = {"start": start, "end": end}
+            if bucket == "day":
+                params["tz"] = settings.TIMEZONE
+            return await self.queries.run_named(
+                db, f"incident_timeseries_{bucket}", params=params, mode="mappings_all"
+            )
+        except Exception as e:
+            await self.queries.error_handler.handle_client_error(e, context="get_timeseries")
+            raise
@@ -1,28 +1,204 @@
 from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine, create_async_engine, async_sessionmaker # create_engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from utils.ClassConfig import settings
+from utils.ClassMetrics import metrics
+from utils.ClassException import ServiceUnavailable
+from utils.ClassSQL import StatementRegistry
+from contextlib import asynccontextmanager
 import asyncio
-from sqlalchemy import text
+import asyncpg
+import math
+import random
+from sqlalchemy import event, text
 import logging
-from pathlib import Path
+import time
 
 logger = logging.getLogger(__name__)
 
+pool_wait_seconds = metrics.histogram(
+    "db_pool_wait_seconds", "Время получения соединения из пула, сек"
+)
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Пул соединений, который считает ожидающих соединение и время ожидания"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiters = 0
+
+    def connect(self):
+        self.waiters += 1
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            self.waiters -= 1
+            pool_wait_seconds.observe(time.perf_counter() - start)
+
 class Base(DeclarativeBase):
     """Базовый класс для всех ORM моделей"""
     pass
 
 # --- Создание движка ---
-engine: AsyncEngine = create_async_engine(
-    settings.ASYNC_DB_URL,
-    echo=settings.DEBUG,                  # логирует SQL-запросы, если DEBUG = True
-    pool_size=settings.DB_POOL_SIZE,      # размер пула соединений
-    pool_pre_ping=True,                   # проверка соединений перед использованием
-    future=True,                          # API SQLAlchemy 2.0
+def create_engine_for(url: str) -> AsyncEngine:
+    """Движок с общими настройками пула (для primary и реплик)"""
+    return create_async_engine(
+        url,
+        echo=settings.DEBUG,                  # логирует SQL-запросы, если DEBUG = True
+        pool_size=settings.DB_POOL_SIZE,      # размер пула соединений
+        max_overflow=settings.DB_MAX_OVERFLOW,    # соединений сверх pool_size при пиках
+        pool_timeout=settings.DB_POOL_TIMEOUT,    # сколько ждать свободное соединение, сек
+        pool_recycle=settings.DB_POOL_RECYCLE,    # пересоздавать соединения старше N сек
+        pool_pre_ping=True,                   # проверка соединений перед использованием
+        poolclass=InstrumentedAsyncPool,      # пул с метриками ожидания
+        future=True,                          # API SQLAlchemy 2.0
+    )
+
+
+engine: AsyncEngine = create_engine_for(settings.ASYNC_DB_URL)
+
+
+def driver_dsn(engine: AsyncEngine) -> str:
+    """DSN движка для отдельных соединений asyncpg вне пула (LISTEN, advisory lock лидера)"""
+    return engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+# --- Метрики пула соединений (вычисляются при каждом опросе /metrics) ---
+metrics.gauge("db_pool_size", "Размер пула соединений").set_function(lambda: engine.pool.size())
+metrics.gauge("db_pool_checked_out", "Соединений выдано из пула").set_function(lambda: engine.pool.checkedout())
+metrics.gauge("db_pool_checked_in", "Свободных соединений в пуле").set_function(lambda: engine.pool.checkedin())
+metrics.gauge("db_pool_overflow", "Соединений сверх pool_size").set_function(lambda: max(0, engine.pool.overflow()))
+metrics.gauge("db_pool_waiters", "Запросов, ожидающих соединение").set_function(lambda: engine.pool.waiters)
+
+
+class PoolAdmission:
+    """
+    Admission control перед выдачей сессии: если пул исчерпан и очередь ожидающих
+    длиннее max_waiters или ожидаемое время ожидания больше max_wait секунд,
+    запрос сразу получает 503 с Retry-After вместо ожидания до pool_timeout.
+    Ожидаемое ожидание оценивается по среднему (EWMA) времени удержания соединения.
+    """
+
+    def __init__(self, engine: AsyncEngine, max_waiters: int, max_wait: float, enabled: bool = True):
+        self.engine = engine
+        self.max_waiters = max_waiters
+        self.max_wait = max_wait
+        self.enabled = enabled
+        self.avg_hold = 0.0         # среднее время удержания соединения, сек
+        self._alpha = 0.2
+        self.rejected = metrics.counter(
+            "db_admission_rejected_total", "Запросы, отклонённые admission control", ["reason"]
+        )
+        event.listen(engine.sync_engine, "checkout", self._on_checkout)
+        event.listen(engine.sync_engine, "checkin", self._on_checkin)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        started = connection_record.info.pop("checked_out_at", None)
+        if started is not None:
+            hold = time.perf_counter() - started
+            self.avg_hold += self._alpha * (hold - self.avg_hold)
+
+    def _capacity(self) -> int:
+        return self.engine.pool.size() + max(0, settings.DB_MAX_OVERFLOW)
+
+    def expected_wait(self) -> float:
+        """Оценка ожидания соединения для нового запроса при исчерпанном пуле, сек"""
+        return (self.engine.pool.waiters + 1) * self.avg_hold / max(1, self._capacity())
+
+    def check(self) -> None:
+        """Пропускает запрос или отклоняет его с ServiceUnavailable (503)"""
+        if not self.enabled or self.engine.pool.checkedout() < self._capacity():
+            return
+
+        expected_wait = self.expected_wait()
+        waiters = self.engine.pool.waiters
+        if waiters >= self.max_waiters:
+            reason = "waiters"
+        elif expected_wait > self.max_wait:
+            reason = "deadline"
+        else:
+            return
+
+        self.rejected.inc(reason=reason)
+        logger.warning(
+            "Запрос отклонён admission control (%s): ожидающих %s, ожидаемое ожидание %.2f сек",
+            reason, waiters, expected_wait,
+        )
+        raise ServiceUnavailable(retry_after=max(1, math.ceil(expected_wait)))
+
+
+admission = PoolAdmission(
+    engine,
+    max_waiters=settings.DB_ADMISSION_MAX_WAITERS,
+    max_wait=settings.DB_ADMISSION_MAX_WAIT,
+    enabled=settings.DB_ADMISSION_ENABLED,
 )
 
 
+class ReplicaRouter:
+    """
+    Выбор реплики для чтения по кругу (round-robin).
+    Реплика, на которой произошла ошибка соединения, исключается на eject_seconds секунд;
+    если все реплики исключены, pick() возвращает None и чтение идёт на primary.
+    """
+
+    def __init__(self, engines: list[AsyncEngine], eject_seconds: float):
+        self.engines = engines
+        self.eject_seconds = eject_seconds
+        self._next = 0
+        self._ejected_until: dict[AsyncEngine, float] = {}
+        self.ejections = metrics.counter(
+            "db_replica_ejections_total", "Исключения реплик из ротации после ошибок", ["replica"]
+        )
+        metrics.gauge("db_replicas_healthy", "Реплик в ротации").set_function(self.healthy_count)
+
+    def _available(self, replica: AsyncEngine, now: float) -> bool:
+        return self._ejected_until.get(replica, 0.0) <= now
+
+    def pick(self) -> AsyncEngine | None:
+        """Следующая доступная реплика или None"""
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            replica = self.engines[self._next % len(self.engines)]
+            self._next += 1
+            if self._available(replica, now):
+                return replica
+        return None
+
+    def eject(self, replica: AsyncEngine, error: BaseException | None = None) -> None:
+        """Временно исключает реплику из ротации (повторное исключение продлевает срок)"""
+        now = time.monotonic()
+        was_available = self._available(replica, now)
+        self._ejected_until[replica] = now + self.eject_seconds
+        if not was_available:
+            return
+        self.ejections.inc(replica=replica.url.host or "")
+        logger.warning(
+            "Реплика %s исключена из ротации на %s сек: %s",
+            replica.url.render_as_string(hide_password=True), self.eject_seconds, error,
+        )
+
+    def restore(self, replica: AsyncEngine) -> None:
+        """Возвращает реплику в ротацию досрочно"""
+        self._ejected_until.pop(replica, None)
+
+    def healthy_count(self) -> int:
+        now = time.monotonic()
+        return sum(self._available(replica, now) for replica in self.engines)
+
+
+# --- Реплики для чтения (пустой DB_REPLICA_URLS — всё на primary) ---
+replica_engines: list[AsyncEngine] = [create_engine_for(url) for url in settings.DB_REPLICA_URLS]
+replicas = ReplicaRouter(replica_engines, settings.DB_REPLICA_EJECT_SECONDS)
+
+
 # --- Фабрика сессий ---
+# Сессии знают о репликах: DBQueries направляет чтения на них (см. DBQueries.run_select)
 async_session_factory = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
@@ -30,14 +206,19 @@ async_session_factory = async_sessionmaker(
     autocommit=False,
     autoflush=False,
     future=True,
+    info={"replicas": replicas} if replica_engines else None,
 )
 
 
-async def get_db() -> AsyncSession:
-    """Асинхронная зависимость для получения сессии БД"""
+@asynccontextmanager
+async def _session_scope():
     async with async_session_factory() as session:
         try:
             yield session
+        except ServiceUnavailable:
+            # перегрузка (admission control, pool_timeout) — не ошибка сессии
+            await session.rollback()
+            raise
         except Exception:
             await session.rollback()
             logger.exception("Database session error")
@@ -46,46 +227,147 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+async def get_db() -> AsyncSession:
+    """Асинхронная зависимость для получения сессии БД (после проверки admission control)"""
+    admission.check()
+    async with _session_scope() as session:
+        yield session
+
+
+async def get_session() -> AsyncSession:
+    """
+    Сессия БД без admission control: для обработчиков с ответами без обращения к БД (202, 304),
+    которые вызывают admission.check() сами, только когда БД действительно понадобится.
+    Сессия подключается лениво и до первого запроса соединение из пула не берёт.
+    """
+    async with _session_scope() as session:
+        yield session
+
+
+class ConnectionProbe:
+    """
+    SELECT 1 на собственном соединении asyncpg вне пула (для фоновых проверок здоровья):
+    занятый пул не делает процесс «неготовым». Соединение переиспользуется между проверками
+    и открывается заново после ошибки или прерванной (по timeout) проверки.
+    """
+
+    def __init__(self, engine: AsyncEngine, connect_timeout: float = 5.0):
+        self.dsn = driver_dsn(engine)
+        self.connect_timeout = connect_timeout
+        self._connection: asyncpg.Connection | None = None
+
+    async def __call__(self) -> None:
+        if self._connection is None or self._connection.is_closed():
+            self._connection = await asyncpg.connect(self.dsn, timeout=self.connect_timeout)
+        try:
+            await self._connection.fetchval("SELECT 1")
+        except BaseException:
+            # в том числе отмена по timeout проверки: состояние соединения неизвестно
+            self._connection.terminate()
+            self._connection = None
+            raise
+
+    async def close(self) -> None:
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close(timeout=5)
+        self._connection = None
+
+
+ping = ConnectionProbe(engine, connect_timeout=settings.HEALTH_PROBE_TIMEOUT)
+replica_pings = {replica: ConnectionProbe(replica, connect_timeout=settings.HEALTH_PROBE_TIMEOUT) for replica in replica_engines}
+
+
+async def probe_replica(replica: AsyncEngine) -> None:
+    """Проверка реплики: при ошибке исключает её из ротации, при успехе возвращает"""
+    try:
+        await replica_pings[replica]()
+    except Exception as e:
+        replicas.eject(replica, e)
+        raise
+    replicas.restore(replica)
+
+
+async def close_probes() -> None:
+    """Закрывает соединения проверок здоровья (при остановке)"""
+    for probe in (ping, *replica_pings.values()):
+        await probe.close()
+
+
 async def check_db_connection(
     engine: AsyncEngine,
     name: str = "default",
-    retries: int = 5,
-    delay: int = 3,
+    retries: int = 8,
+    delay: float = 0.5,
+    max_delay: float = 10.0,
 ) -> None:
-    """Проверка подключения к базе данных с повторными попытками"""
+    """
+    Проверка подключения к базе данных с повторными попытками.
+    Паузы растут экспоненциально (delay, 2*delay, ... до max_delay) со случайным разбросом,
+    чтобы одновременно стартующие процессы не подключались к БД синхронными волнами.
+    """
     for attempt in range(1, retries + 1):
         try:
             async with engine.connect() as conn:
                 await conn.execute(text("SELECT 1"))
-            logger.info(f"✅ Подключение к базе данных '{name}' установлено.")
+            logger.info("✅ Подключение к базе данных '%s' установлено.", name)
             return
         except Exception as e:
             logger.warning(
-                f"⚠️ Ошибка подключения к базе '{name}' "
-                f"(попытка {attempt}/{retries}): {e}"
+                "⚠️ Ошибка подключения к базе '%s' (попытка %s/%s): %s",
+                name, attempt, retries, e
             )
             if attempt < retries:
-                await asyncio.sleep(delay * attempt)
+                await asyncio.sleep(random.uniform(0, min(max_delay, delay * 2 ** (attempt - 1))))
             else:
                 logger.critical(
-                    f"❌ Не удалось подключиться к базе '{name}' "
-                    f"после {retries} попыток."
+                    "❌ Не удалось подключиться к базе '%s' после %s попыток.",
+                    name, retries
                 )
                 raise
 
 
+async def warm_pool(
+    engine: AsyncEngine,
+    statements: StatementRegistry | None = None,
+    names: list[str] = (),
+    size: int | None = None,
+) -> int:
+    """
+    Прогрев пула: параллельно открывает size соединений (по умолчанию pool_size) и готовит на каждом
+    запросы names из реестра statements (StatementRegistry), чтобы первые запросы после старта
+    не платили за подключение и prepare. Возвращает число прогретых соединений; ошибки логируются.
+    """
+    size = engine.pool.size() if size is None else size
+    remaining = size
+    opened = asyncio.Event()
 
-async def run_sql_file(engine: AsyncEngine, sql_file_path: str) -> None:
-    """Выполняет SQL-файл при старте приложения"""
-    sql_path = Path(sql_file_path)
-
-    if not sql_path.exists():
-        raise FileNotFoundError(f"Файл {sql_file_path} не найден")
-
-    sql_content = sql_path.read_text(encoding="utf-8")
-
-    async with engine.begin() as conn:
-        await conn.execute(text(sql_content))
+    def arrive() -> None:
+        nonlocal remaining
+        remaining -= 1
+        if remaining == 0:
+            opened.set()
 
-    logger.info(f"✅ SQL из {sql_file_path} выполнен успешно")
+    async def hold() -> None:
+        arrived = False
+        try:
+            async with engine.connect() as conn:
+                if statements is not None:
+                    driver = (await conn.get_raw_connection()).driver_connection
+                    for name in names:
+                        await statements.prepare(driver, name)
+                arrived = True
+                arrive()
+                # соединение держится, пока не откроются остальные, иначе пул выдал бы его повторно
+                await opened.wait()
+        finally:
+            if not arrived:
+                arrive()
 
+    results = await asyncio.gather(*(hold() for _ in range(size)), return_exceptions=True)
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        logger.warning(
+            "Прогрев пула %s:%s: %s из %s соединений не открыты: %s",
+            engine.url.host, engine.url.port, len(errors), size, errors[0],
+        )
+    return size - len(errors)
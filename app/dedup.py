@@ -0,0 +1,118 @@
+from datetime import datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+import hashlib
+import logging
+import re
+
+from utils.ClassCache import TTLCache
+from utils.ClassMetrics import metrics
+
+
+absorbed_total = metrics.counter(
+    "incidents_dedup_absorbed_total", "Повторы инцидентов, поглощённые дедупликацией", ["where"]
+)
+
+# Изменчивые части описания, которые не делают инцидент новым: идентификаторы, адреса, числа
+_VOLATILE = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"   # UUID
+    r"|\b0x[0-9a-f]+\b"                                               # hex
+    r"|\b[0-9a-f]*\d[0-9a-f]*\b"                                      # числа и hex-идентификаторы
+)
+_SPACES = re.compile(r"\s+")
+
+# Повторы из кэша добавляются к инцидентам одним оператором. Строки блокируются по порядку id,
+# чтобы сбросы нескольких процессов не взаимоблокировались.
+FLUSH_REPEATS = """
+    WITH repeats AS (
+        SELECT * FROM unnest(
+            CAST(:ids AS INTEGER[]), CAST(:created_at AS TIMESTAMPTZ[]),
+            CAST(:repeats AS INTEGER[]), CAST(:last_seen_at AS TIMESTAMPTZ[])
+        ) AS r(id, created_at, repeats, last_seen_at)
+    ), locked AS (
+        SELECT i.id, i.created_at FROM incidents i
+        JOIN repeats r ON i.id = r.id AND i.created_at = r.created_at
+        ORDER BY i.id
+        FOR UPDATE OF i
+    )
+    UPDATE incidents i
+    SET occurrences = i.occurrences + r.repeats,
+        last_seen_at = GREATEST(i.last_seen_at, r.last_seen_at)
+    FROM repeats r JOIN locked l ON l.id = r.id AND l.created_at = r.created_at
+    WHERE i.id = r.id AND i.created_at = r.created_at
+"""
+
+
+def fingerprint(description: str, source: str) -> str:
+    """Отпечаток инцидента: sha256 от источника и описания без регистра, чисел и идентификаторов"""
+    normalized = _VOLATILE.sub("#", description.lower())
+    normalized = _SPACES.sub(" ", normalized).strip()
+    return hashlib.sha256(f"{source}\x00{normalized}".encode()).hexdigest()
+
+
+class IncidentDeduplicator:
+    """
+    Окно дедупликации в памяти процесса.
+    Открытый инцидент с отпечатком хранится в кэше window секунд с момента записи в БД:
+    повторы за это время увеличивают occurrences и last_seen_at у копии в кэше, а в БД
+    накопленные повторы пишет flush (фоновая задача и остановка приложения).
+    Окно не продлевается повторами, поэтому решённый в другом процессе инцидент
+    перестаёт поглощать повторы не позже чем через window секунд.
+    """
+
+    def __init__(self, engine: AsyncEngine, window: float = 10.0, maxsize: int = 10000,
+                 logger: logging.Logger | None = None):
+        self.engine = engine
+        self.cache = TTLCache(maxsize=maxsize, ttl=window)
+        self.logger = logger or logging.getLogger(__name__)
+        # (id, created_at) -> [повторы, время последнего повтора], ещё не записанные в БД
+        self._pending: dict[tuple[int, datetime], list] = {}
+
+    def absorb(self, key: str) -> dict | None:
+        """Поглощает повтор инцидента из окна; None, если отпечатка в окне нет"""
+        incident = self.cache.get(key)
+        if incident is None:
+            return None
+
+        now = datetime.now(timezone.utc)
+        incident["occurrences"] += 1
+        incident["last_seen_at"] = now
+        pending = self._pending.setdefault((incident["id"], incident["created_at"]), [0, now])
+        pending[0] += 1
+        pending[1] = now
+        absorbed_total.inc(where="cache")
+        return dict(incident)
+
+    def remember(self, key: str, incident: dict) -> None:
+        """Открывает окно для инцидента, только что записанного в БД"""
+        self.cache.set(key, dict(incident))
+
+    def forget(self, key: str) -> None:
+        """Закрывает окно (инцидент решён в этом процессе)"""
+        self.cache.pop(key)
+
+    async def flush(self) -> int:
+        """Записывает накопленные повторы в БД; возвращает число обновлённых инцидентов"""
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, {}
+        params = {"ids": [], "created_at": [], "repeats": [], "last_seen_at": []}
+        for (incident_id, created_at), (repeats, last_seen_at) in pending.items():
+            params["ids"].append(incident_id)
+            params["created_at"].append(created_at)
+            params["repeats"].append(repeats)
+            params["last_seen_at"].append(last_seen_at)
+        try:
+            async with self.engine.begin() as conn:
+                await conn.execute(text(FLUSH_REPEATS), params)
+        except BaseException:
+            # повторы не теряются: вернутся в следующий сброс вместе с новыми
+            for key, (repeats, last_seen_at) in pending.items():
+                current = self._pending.setdefault(key, [0, last_seen_at])
+                current[0] += repeats
+                current[1] = max(current[1], last_seen_at)
+            raise
+
+        self.logger.debug("Записаны повторы инцидентов: %s", len(pending))
+        return len(pending)
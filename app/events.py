@@ -0,0 +1,281 @@
+from collections import deque
+from datetime import datetime
+from typing import Callable
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+
+import asyncpg
+
+from app.schemas import incident_row_adapter, to_incident_row
+from utils.ClassMetrics import metrics
+
+
+# Канал уведомлений триггеров incidents (см. миграцию 0007)
+CHANNEL = "incident_events"
+
+events_total = metrics.counter("incident_events_received_total", "События ленты инцидентов из LISTEN", ["type"])
+disconnects_total = metrics.counter(
+    "incident_stream_disconnects_total", "Подписчики ленты инцидентов, отключённые сервисом", ["reason"]
+)
+subscribers_gauge = metrics.gauge("incident_stream_subscribers", "Подписчики ленты инцидентов")
+listener_up = metrics.gauge("incident_events_listener_up", "Соединение LISTEN ленты инцидентов установлено")
+
+
+class IncidentEvent:
+    """Событие ленты: сообщения SSE и WebSocket собираются один раз для всех подписчиков"""
+
+    __slots__ = ("event_id", "type", "status", "old_status", "ids", "incident", "sse", "message")
+
+    def __init__(
+        self,
+        event_id: int,
+        type: str,
+        incident: dict | None,
+        data: bytes,
+        old_status: str | None = None,
+        ids: list[int] | None = None,
+    ):
+        self.event_id = event_id
+        self.type = type
+        self.incident = incident        # строка инцидента (как из БД) или None для служебных событий
+        self.status = incident["status"] if incident else None
+        self.old_status = old_status    # статус до изменения (для status_changed)
+        self.ids = ids                  # id изменённых инцидентов (для invalidate; None — неизвестны)
+        incident = data.decode()
+        id_line = f"id: {event_id}\n" if event_id else ""
+        self.sse = f"{id_line}event: {type}\ndata: {incident}\n\n".encode()
+        self.message = f'{{"event_id":{event_id},"type":"{type}","incident":{incident}}}'
+
+
+# Событие «история прервана»: клиенту нужно перечитать список через GET /incidents
+RESET = IncidentEvent(0, "reset", None, b"null")
+
+
+class Subscription:
+    """Подписчик ленты с собственным ограниченным буфером"""
+
+    def __init__(self, buffer_size: int, status: str | None = None):
+        self.queue: asyncio.Queue[IncidentEvent] = asyncio.Queue(maxsize=buffer_size)
+        self.status = status
+        self.closed: str | None = None      # причина отключения
+
+    def offer(self, event: IncidentEvent) -> bool:
+        """
+        Кладёт событие в буфер; False — буфер переполнен.
+        С фильтром по статусу проходят события, где статус совпадает до или после изменения:
+        подписчик узнаёт и об инцидентах, покинувших его статус.
+        """
+        if event.status is not None and self.status not in (None, event.status, event.old_status):
+            return True
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def reset(self) -> None:
+        """Буфер очищается, остаётся только событие reset"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(RESET)
+
+    def close(self, reason: str) -> None:
+        """Отключение сервисом: буфер очищается, ожидающий next просыпается и видит closed"""
+        self.closed = reason
+        self.reset()
+
+    async def next(self, timeout: float) -> IncidentEvent | None:
+        """Следующее событие или None, если за timeout секунд событий не было"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class IncidentEventHub:
+    """
+    Одно соединение LISTEN на процесс, раздающее события всем подписчикам ленты.
+    Последние history событий хранятся в кольцевом буфере для продолжения с Last-Event-ID.
+    Подписчик, чей буфер переполнен (не успевает читать), отключается.
+    При потере соединения LISTEN события за время переподключения теряются: история
+    очищается, а подписчики получают событие reset.
+
+    version — общая для процессов версия данных incidents: номер последнего полученного уведомления
+    (incident_events_seq). Уведомления приходят всем процессам в порядке фиксации транзакций, поэтому
+    процессы, получившие одно и то же последнее уведомление, видят одни и те же данные. Сразу после
+    подключения версия — хэш снимка транзакций PostgreSQL; без соединения LISTEN — None.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        history: int = 1000,
+        buffer_size: int = 256,
+        max_subscribers: int = 1000,
+        reconnect_delay: float = 1.0,
+        ping_interval: float = 30.0,
+        logger: logging.Logger | None = None,
+    ):
+        self.dsn = dsn
+        self.history: deque[IncidentEvent] = deque(maxlen=history)
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.reconnect_delay = reconnect_delay
+        self.ping_interval = ping_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self.subscribers: set[Subscription] = set()
+        self.connected = False
+        self.version: str | None = None
+        self._change_listeners: list[Callable[[IncidentEvent], None]] = []
+        self._task: asyncio.Task | None = None
+        subscribers_gauge.set_function(lambda: len(self.subscribers))
+        listener_up.set_function(lambda: int(self.connected))
+
+    def on_change(self, callback: Callable[[IncidentEvent], None]) -> None:
+        """
+        callback(event) вызывается при любом изменении incidents, о котором известно процессу:
+        событии ленты, уведомлении invalidate (служебное событие type="invalidate", подписчикам
+        не отправляется) и потере соединения LISTEN (RESET)
+        """
+        self._change_listeners.append(callback)
+
+    def _changed(self, event: IncidentEvent) -> None:
+        for callback in self._change_listeners:
+            callback(event)
+
+    # --- подписчики ---
+
+    def subscribe(self, last_event_id: int | None = None, status: str | None = None) -> Subscription | None:
+        """
+        Новый подписчик (None — достигнут max_subscribers). С last_event_id в буфер сразу попадают
+        пропущенные события из истории, а если их там уже нет или они не помещаются в буфер — событие reset.
+        """
+        if len(self.subscribers) >= self.max_subscribers:
+            disconnects_total.inc(reason="limit")
+            return None
+
+        subscription = Subscription(self.buffer_size, status)
+        if last_event_id is not None:
+            missed = self._since(last_event_id)
+            if missed is None:
+                subscription.offer(RESET)
+            else:
+                for event in missed:
+                    if not subscription.offer(event):
+                        subscription.reset()
+                        break
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscribers.discard(subscription)
+
+    def _since(self, last_event_id: int) -> list[IncidentEvent] | None:
+        """События истории после last_event_id (в порядке доставки) или None, если его нет в истории"""
+        events = list(self.history)
+        for position, event in enumerate(events):
+            if event.event_id == last_event_id:
+                return events[position + 1:]
+        return None
+
+    def publish(self, event: IncidentEvent) -> None:
+        """Раздаёт событие подписчикам; не успевающие читать отключаются"""
+        self._changed(event)
+        if event is not RESET:
+            self.history.append(event)
+        for subscription in list(self.subscribers):
+            if not subscription.offer(event):
+                self.unsubscribe(subscription)
+                subscription.close("slow")
+                disconnects_total.inc(reason="slow")
+
+    # --- соединение LISTEN ---
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            if message["type"] == "invalidate":
+                # изменение без события ленты (см. миграцию 0008)
+                events_total.inc(type="invalidate")
+                self._advance(message.get("event_id"))
+                self._changed(IncidentEvent(0, "invalidate", None, b"null", ids=message.get("ids")))
+                return
+            incident = message["incident"]
+            for field in ("created_at", "last_seen_at"):
+                if incident[field] is not None:
+                    incident[field] = datetime.fromisoformat(incident[field])
+            event = IncidentEvent(
+                message["event_id"], message["type"], incident,
+                incident_row_adapter.dump_json(to_incident_row(incident)),
+                old_status=message.get("old_status"),
+            )
+        except Exception:
+            self.logger.exception("Некорректное событие ленты инцидентов: %s", payload[:200])
+            return
+        events_total.inc(type=event.type)
+        self._advance(event.event_id)
+        self.publish(event)
+
+    def _advance(self, event_id: int | None) -> None:
+        # уведомление без номера (например, NOTIFY вручную) — версия, известная только этому процессу
+        self.version = str(event_id) if event_id else uuid.uuid4().hex[:12]
+
+    async def _listen(self) -> None:
+        connection = await asyncpg.connect(self.dsn)
+        lost = asyncio.Event()
+        try:
+            connection.add_termination_listener(lambda _: lost.set())
+            await connection.add_listener(CHANNEL, self._on_notify)
+            # снимок берётся после LISTEN: изменения после него придут уведомлениями
+            snapshot = await connection.fetchval("SELECT pg_current_snapshot()::text")
+            self.version = "s" + hashlib.blake2b(snapshot.encode(), digest_size=8).hexdigest()
+            self.connected = True
+            self.logger.info("Лента инцидентов: LISTEN %s", CHANNEL)
+            while not lost.is_set():
+                # без трафика обрыв сети может остаться незамеченным — проверяем соединение сами
+                try:
+                    await asyncio.wait_for(lost.wait(), self.ping_interval)
+                except asyncio.TimeoutError:
+                    await connection.execute("SELECT 1", timeout=self.ping_interval)
+        finally:
+            self._disconnected()
+            if not connection.is_closed():
+                await connection.close(timeout=5)
+
+    def _disconnected(self) -> None:
+        self.version = None
+        if self.connected:
+            self.connected = False
+            self.history.clear()
+            self.publish(RESET)
+            if self._task is not None and not self._task.cancelling():
+                self.logger.warning("Лента инцидентов: соединение LISTEN потеряно")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning("Лента инцидентов: ошибка соединения LISTEN: %s", e)
+            await asyncio.sleep(self.reconnect_delay)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="incident_events")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscription in list(self.subscribers):
+            self.unsubscribe(subscription)
+            subscription.close("shutdown")
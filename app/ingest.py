@@ -0,0 +1,137 @@
+from typing import Awaitable, Callable
+import asyncio
+import logging
+import uuid
+
+from utils.ClassException import ServiceUnavailable
+from utils.ClassMetrics import metrics
+
+
+queue_depth = metrics.gauge("incidents_write_behind_queue_depth", "Инциденты в очереди отложенной записи")
+batch_size_histogram = metrics.histogram(
+    "incidents_write_behind_batch_size", "Размер пакета отложенной записи инцидентов", [],
+    buckets=(1, 5, 10, 50, 100, 250, 500, 1000, 5000),
+)
+write_behind_total = metrics.counter(
+    "incidents_write_behind_total", "Инциденты отложенной записи по результату", ["result"]
+)
+
+# Повторы записи пакета при ошибке БД: паузы между попытками, сек
+WRITE_RETRY_DELAYS = (0.5, 2.0, 5.0)
+
+
+class IncidentWriteBehind:
+    """
+    Отложенная запись инцидентов: запрос кладёт инцидент в ограниченную очередь процесса
+    и сразу получает тикет, а фоновая задача пишет очередь пакетами через write —
+    каждые flush_interval секунд или по набору batch_size инцидентов.
+    Переполненная очередь отклоняет новые инциденты с 503; stop дописывает очередь до конца.
+    Тикет непрозрачен и нужен только для корреляции с логом: сервис его не хранит, а соответствие
+    тикет -> id (или потерю пакета) пишет в лог при записи.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[list], Awaitable[list[dict]]],
+        maxsize: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+        logger: logging.Logger | None = None,
+    ):
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self.queue: asyncio.Queue[tuple[str, object]] = asyncio.Queue(maxsize=maxsize)
+        self._ready = asyncio.Event()       # в очереди есть инциденты
+        self._full = asyncio.Event()        # набран полный пакет
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+        queue_depth.set_function(self.queue.qsize)
+
+    def submit(self, payload) -> str:
+        """Ставит инцидент в очередь и возвращает тикет; при переполнении — ServiceUnavailable (503)"""
+        if self._stopping:
+            write_behind_total.inc(result="rejected")
+            raise ServiceUnavailable("Приложение останавливается, повторите запрос позже")
+        ticket = uuid.uuid4().hex
+        try:
+            self.queue.put_nowait((ticket, payload))
+        except asyncio.QueueFull:
+            write_behind_total.inc(result="rejected")
+            self.logger.warning("Очередь отложенной записи переполнена (%s), инцидент отклонён", self.queue.maxsize)
+            raise ServiceUnavailable(retry_after=max(1, round(self.flush_interval)))
+
+        write_behind_total.inc(result="accepted")
+        self._ready.set()
+        if self.queue.qsize() >= self.batch_size:
+            self._full.set()
+        return ticket
+
+    def _drain(self) -> list[tuple[str, object]]:
+        """Забирает из очереди до batch_size инцидентов"""
+        batch = []
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        if self.queue.empty():
+            self._ready.clear()
+        if self.queue.qsize() < self.batch_size:
+            self._full.clear()
+        return batch
+
+    async def _write_batch(self, batch: list[tuple[str, object]]) -> None:
+        """Пишет пакет с повторами; после последней неудачи инциденты пакета теряются (в лог)"""
+        tickets = [ticket for ticket, _ in batch]
+        payloads = [payload for _, payload in batch]
+        batch_size_histogram.observe(len(batch))
+        for attempt, delay in enumerate((*WRITE_RETRY_DELAYS, None), start=1):
+            try:
+                incidents = await self.write(payloads)
+                write_behind_total.inc(len(batch), result="written")
+                # единственное место, где тикет связывается с id инцидента (тикеты нигде не хранятся)
+                self.logger.info(
+                    "Отложенная запись, тикет -> id: %s",
+                    {ticket: incident["id"] for ticket, incident in zip(tickets, incidents)},
+                )
+                return
+            except Exception:
+                if delay is None:
+                    write_behind_total.inc(len(batch), result="failed")
+                    self.logger.exception(
+                        "Пакет отложенной записи потерян после %s попыток, тикеты: %s", attempt, tickets
+                    )
+                    return
+                self.logger.warning("Ошибка записи пакета инцидентов (попытка %s), повтор через %s сек",
+                                    attempt, delay, exc_info=True)
+                await asyncio.sleep(delay)
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            if not self._stopping and self.queue.qsize() < self.batch_size:
+                # ждём полного пакета не дольше flush_interval
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._drain()
+            if batch:
+                await self._write_batch(batch)
+            if self._stopping and self.queue.empty():
+                return
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="incidents_write_behind")
+
+    async def stop(self) -> None:
+        """Перестаёт принимать инциденты и дописывает очередь"""
+        self._stopping = True
+        self._ready.set()
+        self._full.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        if not self.queue.empty():
+            self.logger.error("Очередь отложенной записи не дописана: %s инцидентов", self.queue.qsize())
@@ -1,16 +1,33 @@
-from fastapi import FastAPI, Request, Depends
-from fastapi.exceptions import RequestValidationError
-from sqlalchemy.ext.asyncio import AsyncSession
 import asyncio
-import logging
 import datetime
+import time
+
+from utils.ClassStartup import StartupTimer
+
+# Создаётся до импорта приложения: импорт модулей входит в отчёт о старте
+startup_timer = StartupTimer()
+
+from fastapi import FastAPI, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response
 
 from utils.ClassConfig import settings, logger_config
-from app.database import engine, get_db, check_db_connection, run_sql_file
+from app.database import (
+    engine, replica_engines, check_db_connection, ping, probe_replica, close_probes, driver_dsn, warm_pool,
+)
 from app.api import router as incidents_router
+from app.api import queries as incident_queries, service as incident_service, write_behind, events
+from app.admin import router as admin_router
+from app.migrate import runner as migrations
+from app.maintenance import IncidentMaintenance
+from app.rollups import IncidentRollups
 
 from utils.ClassError import ErrorHandler
-from utils.ClassSQL import DBQueries
+from utils.ClassException import AppException
+from utils.ClassHealth import HealthProber
+from utils.ClassLeader import LeaderElection
+from utils.ClassScheduler import PeriodicJob
+from utils.ClassMetrics import metrics
 from utils.handlers import validation_exception_handler
 
 
@@ -18,10 +35,83 @@ from utils.handlers import validation_exception_handler
 logger_config.setup_logger()
 logger = logger_config.get_logger(__name__)
 logger.info("Запуск приложения")
+startup_timer.since_start("import")
 
 # --- Инициализация вспомогательных классов ---
 error_handler = ErrorHandler(logger)
-queries = DBQueries(error_handler)
+
+# Фоновые проверки здоровья на собственных соединениях (вне пула); эндпоинты отвечают из кэша.
+# Готовность определяется только primary — при недоступных репликах чтения идут на него —
+# и наступает после прогрева пулов (см. warm_up).
+health = HealthProber(
+    checks={
+        "database": ping,
+        **{
+            f"replica:{replica.url.host}:{replica.url.port}": (lambda replica=replica: probe_replica(replica))
+            for replica in replica_engines
+        },
+    },
+    interval=settings.HEALTH_PROBE_INTERVAL,
+    timeout=settings.HEALTH_PROBE_TIMEOUT,
+    stale_after=settings.HEALTH_PROBE_STALE_AFTER,
+    critical={"database"},
+    warmup=True,
+    logger=logger,
+)
+
+# Обслуживание incidents: секции вперёд и retention (один процесс за раз — advisory lock)
+maintenance = IncidentMaintenance(
+    engine,
+    months_ahead=settings.INCIDENTS_PARTITIONS_AHEAD,
+    retention_mode=settings.INCIDENTS_RETENTION_MODE,
+    retention_days=settings.INCIDENTS_RETENTION_DAYS,
+    batch_size=settings.INCIDENTS_RETENTION_BATCH_SIZE,
+    batch_pause=settings.INCIDENTS_RETENTION_BATCH_PAUSE,
+    logger=logger,
+)
+maintenance_job = PeriodicJob(
+    "incidents_maintenance", maintenance.run, interval=settings.INCIDENTS_MAINTENANCE_INTERVAL, logger=logger
+)
+
+# Пересчёт агрегатов incident_rollups для временных рядов
+rollups = IncidentRollups(
+    engine,
+    tz=settings.TIMEZONE,
+    hourly_retention_days=settings.ROLLUP_HOURLY_RETENTION_DAYS,
+    batch_size=settings.ROLLUP_BATCH_SIZE,
+    logger=logger,
+)
+rollups_job = PeriodicJob("incident_rollups", rollups.run, interval=settings.ROLLUP_INTERVAL, logger=logger)
+
+# Ключ advisory lock лидера (общий для всех процессов сервиса)
+LEADER_LOCK_ID = 7_301_024
+
+
+async def start_singleton_jobs():
+    maintenance_job.start()
+    rollups_job.start()
+
+
+async def stop_singleton_jobs():
+    await maintenance_job.stop()
+    await rollups_job.stop()
+
+
+# При нескольких процессах (app/serve.py) миграции и singleton-задачи выполняет только лидер
+leader = LeaderElection(
+    driver_dsn(engine),
+    LEADER_LOCK_ID,
+    on_elected=start_singleton_jobs,
+    on_lost=stop_singleton_jobs,
+    interval=settings.LEADER_POLL_INTERVAL,
+    logger=logger,
+)
+
+# Запись повторов, поглощённых окном дедупликации
+dedup_job = PeriodicJob(
+    "incidents_dedup_flush", incident_service.dedup.flush, interval=settings.INCIDENTS_DEDUP_FLUSH_INTERVAL,
+    logger=logger,
+) if incident_service.dedup is not None else None
 
 
 app = FastAPI(
@@ -34,6 +124,54 @@ start_time = datetime.datetime.utcnow()
 
 # --- Роуты ---
 app.include_router(incidents_router, prefix=settings.API_PREFIX)
+if settings.ADMIN_TOKEN:
+    # служебные эндпоинты (статистика SQL) — только с токеном
+    app.include_router(admin_router, prefix=settings.API_PREFIX)
+
+# --- Метрики ---
+http_request_seconds = metrics.histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса, сек", ["method", "route"]
+)
+http_requests_total = metrics.counter(
+    "http_requests_total", "HTTP-запросы по маршрутам и кодам ответа", ["method", "route", "status"]
+)
+metrics.gauge(
+    "db_prepared_statements", "Кэш prepared statements: попадания, промахи, вытеснения", ["result"]
+).set_function(lambda: {
+    (key,): value for key, value in incident_queries.statements.stats().items()
+    if key in ("hits", "misses", "evictions")
+})
+metrics.gauge(
+    "monitoring_cache", "Кэш статистики мониторинга: попадания, промахи", ["result"]
+).set_function(lambda: {
+    (key,): value for key, value in incident_service.stats_cache.stats().items()
+    if key in ("hits", "misses")
+})
+metrics.gauge(
+    "incident_cache", "Кэш инцидентов по id: попадания, промахи, вытеснения", ["result"]
+).set_function(lambda: {
+    (key,): value for key, value in incident_service.incident_cache.stats().items()
+    if key in ("hits", "misses", "evictions")
+})
+metrics.gauge("log_records_dropped", "Записей лога, отброшенных из-за переполнения очереди").set_function(
+    lambda: logger_config.dropped_records
+)
+
+
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    """Латентность и коды ответов по шаблонам маршрутов."""
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        http_request_seconds.observe(time.perf_counter() - start, method=request.method, route=route_path)
+        http_requests_total.inc(method=request.method, route=route_path, status=str(status_code))
 
 # --- Обработчики исключений ---
 @app.exception_handler(Exception)
@@ -41,55 +179,147 @@ async def global_exception_handler(request: Request, exc: Exception):
     """Глобальный перехват всех исключений приложения."""
     return await error_handler.handle_http_exception(request, exc)
 
+# Ошибки приложения обрабатываются внутри стека middleware, чтобы метрики видели реальный код ответа
+app.add_exception_handler(AppException, global_exception_handler)
+
 # Ошибки валидации (Pydantic)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
 
 
 
-async def lifestile_task(logger: logging.Logger, interval: int = 300):
-    """Периодическая проверка активности сервиса."""
-    while True:
-        logger.info("Service lifecycle: running OK")
-        await asyncio.sleep(interval)
+async def warm_pool_within(target, names: list[str]) -> int:
+    """Прогрев пула движка не дольше DB_POOL_TIMEOUT (недоступная реплика не задерживает готовность)"""
+    try:
+        return await asyncio.wait_for(
+            warm_pool(target, incident_queries.statements, names), settings.DB_POOL_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        logger.warning(
+            "Прогрев пула %s:%s не завершён за %s с", target.url.host, target.url.port, settings.DB_POOL_TIMEOUT
+        )
+        return 0
+
 
+def start_pool_jobs():
+    """Фоновые задачи, берущие соединения из пула; обслуживание и агрегаты запускаются только у лидера"""
+    health.start()
+    leader.start()
+    if dedup_job is not None:
+        dedup_job.start()
+
+
+async def warm_up():
+    """
+    Прогрев после старта: пулы primary и реплик параллельно открываются до pool_size,
+    на каждом соединении готовятся горячие запросы IncidentService. До завершения
+    readiness отвечает 503, поэтому трафик приходит на уже прогретый процесс.
+    Задачи с пулом стартуют после прогрева: иначе их соединения вытеснили бы прогретые из пула.
+    Остановка во время прогрева (отмена задачи) задачи не запускает и готовым процесс не делает.
+    """
+    try:
+        if settings.DB_POOL_WARMUP:
+            statements = incident_queries.statements
+            with startup_timer.phase("warmup"):
+                warmed = await asyncio.gather(
+                    warm_pool_within(engine, statements.names()),
+                    *(warm_pool_within(replica, statements.names(read_only=True)) for replica in replica_engines),
+                )
+            logger.info("Пулы прогреты: %s соединений, %s запросов", sum(warmed), len(statements.names()))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning("Прогрев пулов не выполнен: %s", e)
+    start_pool_jobs()
+    health.warmed()
+    startup_timer.report(logger)
+
+
+warmup_task: asyncio.Task | None = None
 
 
 @app.on_event("startup")
 async def startup_event():
     """Действия при старте приложения."""
+    global warmup_task
     logger.info("🚀 Инициализация приложения и проверка подключений к БД...")
-    await check_db_connection(engine=engine, name=settings.DB_NAME)
+    with startup_timer.phase("connect"):
+        await check_db_connection(engine=engine, name=settings.DB_NAME)
 
-    # Только в режиме разработки создаём таблицы
-    if settings.ENVIRONMENT.lower() == "development":
-        try:
-            await run_sql_file(engine, "app/sql/create_table.sql")
-            logger.info("Таблицы успешно созданы из SQL файла")
-        except Exception as e:
-            logger.exception(f"Ошибка при создании таблиц: {e}")
+    # Лента событий держит своё соединение и подключается параллельно с миграциями
+    events.start()
+    write_behind.start()
 
-    # Запуск фонового мониторинга
-    asyncio.create_task(lifestile_task(logger=logger, interval=300))
+    # Миграции применяет лидер, остальные процессы ждут их применения
+    if settings.DB_MIGRATE_ON_STARTUP:
+        with startup_timer.phase("migrations"):
+            if await leader.try_acquire():
+                await migrations.migrate()
+            else:
+                await migrations.wait()
 
+    # Прогрев идёт в фоне: процесс сразу отвечает на liveness, readiness ждёт прогрева
+    warmup_task = asyncio.get_running_loop().create_task(warm_up(), name="startup_warmup")
 
-@app.get("/api/health", tags=["Health"], summary="Проверка состояния сервиса")
-async def health_check(db: AsyncSession = Depends(get_db)):
-    """Эндпоинт для проверки доступности сервиса и БД."""
-    status = "healthy"
-    try:
-        await queries.run_select(db=db, query="SELECT 1", mode="scalar")
-        logger.info("✅ DB connection OK")
-    except Exception as e:
-        status = "unhealthy"
-        logger.exception("❌ Health check failed")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Действия при остановке приложения."""
+    logger.info("Остановка приложения")
+    if warmup_task is not None and not warmup_task.done():
+        # до остановки остальных компонентов: прерванный прогрев не запускает задачи с пулом
+        warmup_task.cancel()
+        try:
+            await warmup_task
+        except asyncio.CancelledError:
+            pass
+    await health.stop()
+    await close_probes()
+    await leader.stop()             # останавливает singleton-задачи и освобождает лидерство
+    await write_behind.stop()       # дописывает очередь отложенной записи
+    await events.stop()
+    if dedup_job is not None:
+        await dedup_job.stop()
+        await dedup_job.run_once()      # повторы из окна не теряются при остановке
+    await engine.dispose()
+    for replica in replica_engines:
+        await replica.dispose()
+    logger_config.shutdown()
+
+
+@app.get("/api/health", tags=["Health"], summary="Проверка состояния сервиса")
+async def health_check():
+    """Состояние сервиса и БД по результатам последней фоновой проверки (без обращения к БД)."""
     uptime = (datetime.datetime.utcnow() - start_time).total_seconds()
 
     return {
-        "status": status,
+        "status": "healthy" if health.ready() else "unhealthy",
         "service": settings.APP_NAME,
         "version": settings.APP_VERSION,
         "environment": settings.ENVIRONMENT,
         "debug": settings.DEBUG,
-        "uptime_seconds": int(uptime)
+        "uptime_seconds": int(uptime),
+        "checks": health.snapshot(),
     }
+
+
+@app.get("/api/health/live", tags=["Health"], summary="Liveness: процесс жив")
+async def liveness():
+    """Процесс отвечает на запросы; зависимости не проверяются."""
+    return {"status": "alive"}
+
+
+@app.get("/api/health/ready", tags=["Health"], summary="Readiness: сервис готов принимать трафик")
+async def readiness():
+    """200, если процесс прогрет, а последняя проверка БД успешна и не устарела, иначе 503."""
+    ready = health.ready()
+    status = "ready" if ready else "not_ready" if health.warm else "warming"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": status, "checks": health.snapshot()},
+    )
+
+
+@app.get("/metrics", tags=["Health"], summary="Метрики в формате Prometheus")
+async def metrics_endpoint():
+    """Метрики процесса в текстовом формате экспозиции Prometheus."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,196 @@
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+import asyncio
+import logging
+import re
+
+from utils.ClassMetrics import metrics
+
+
+# Ключ advisory lock обслуживания (общий для всех процессов сервиса)
+MAINTENANCE_LOCK_ID = 7_301_016
+
+# Секция incidents_pYYYY_MM (см. incidents_create_partition в миграции 0003)
+_PARTITION_NAME = re.compile(r"^incidents_p(\d{4})_(\d{2})$")
+
+RETENTION_MODES = ("off", "archive", "detach")
+
+archived_total = metrics.counter("incidents_archived_total", "Инциденты, перенесённые в incidents_archive")
+detached_total = metrics.counter("incidents_partitions_detached_total", "Секции incidents, отсоединённые retention")
+
+# Пачка решённых инцидентов старше cutoff: удаляется из incidents и вставляется в архив в одной транзакции.
+# SKIP LOCKED — не ждать строки, которые сейчас обновляют запросы пользователей.
+ARCHIVE_BATCH = """
+    WITH moved AS (
+        DELETE FROM incidents
+        WHERE (id, created_at) IN (
+            SELECT id, created_at FROM incidents
+            WHERE status = 'resolved' AND created_at < :cutoff
+            ORDER BY created_at
+            LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, description, status, source, created_at, occurrences, last_seen_at
+    )
+    INSERT INTO incidents_archive (id, description, status, source, created_at, occurrences, last_seen_at)
+    SELECT id, description, status, source, created_at, occurrences, last_seen_at FROM moved
+    ON CONFLICT DO NOTHING
+"""
+
+# Отсоединённая секция больше не видна триггерам incidents: вычитаем её строки из счётчиков
+SUBTRACT_COUNTERS = """
+    INSERT INTO incident_counters (dimension, key, count)
+    SELECT dimension, key, -SUM(count)
+    FROM (
+        SELECT 'status' AS dimension, status AS key, COUNT(*) AS count FROM "{table}" GROUP BY status
+        UNION ALL
+        SELECT 'source', source, COUNT(*) FROM "{table}" GROUP BY source
+    ) totals
+    GROUP BY dimension, key
+    ORDER BY dimension, key
+    ON CONFLICT (dimension, key) DO UPDATE SET count = incident_counters.count + EXCLUDED.count
+"""
+
+# Отпечатки открытых инцидентов отсоединённой секции освобождаются (см. миграцию 0006)
+RELEASE_FINGERPRINTS = """
+    DELETE FROM incident_fingerprints f
+    USING "{table}" t
+    WHERE f.incident_id = t.id AND f.incident_created_at = t.created_at
+"""
+
+
+def _partition_end(name: str) -> date | None:
+    """Первый день месяца после секции incidents_pYYYY_MM (None для других таблиц)"""
+    match = _PARTITION_NAME.match(name)
+    if not match:
+        return None
+    year, month = int(match.group(1)), int(match.group(2))
+    return date(year + month // 12, month % 12 + 1, 1)
+
+
+class IncidentMaintenance:
+    """
+    Обслуживание секционированной таблицы incidents: создание секций на months_ahead месяцев вперёд
+    и retention данных старше retention_days дней.
+    retention_mode:
+        off     — только секции;
+        archive — решённые инциденты переносятся в incidents_archive пачками по batch_size
+                  с паузой batch_pause секунд между пачками;
+        detach  — секции, целиком старше срока, отсоединяются (DETACH PARTITION ... CONCURRENTLY)
+                  и остаются отдельными таблицами incidents_archive_pYYYY_MM.
+    Запуск пропускается, если обслуживание уже выполняет другой процесс (advisory lock).
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        months_ahead: int = 3,
+        retention_mode: str = "off",
+        retention_days: int = 365,
+        batch_size: int = 1000,
+        batch_pause: float = 0.5,
+        logger: logging.Logger | None = None,
+    ):
+        if retention_mode not in RETENTION_MODES:
+            raise ValueError(f"Неизвестный режим retention: {retention_mode}")
+        self.engine = engine
+        self.months_ahead = months_ahead
+        self.retention_mode = retention_mode
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.logger = logger or logging.getLogger(__name__)
+
+    def _cutoff(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+
+    async def run(self) -> None:
+        """Один проход обслуживания"""
+        async with self.engine.connect() as conn:
+            lock = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            locked = await lock.scalar(text("SELECT pg_try_advisory_lock(:id)"), {"id": MAINTENANCE_LOCK_ID})
+            if not locked:
+                self.logger.info("Обслуживание incidents выполняет другой процесс, пропуск")
+                return
+            try:
+                await self.ensure_partitions()
+                if self.retention_mode == "archive":
+                    await self.archive_resolved()
+                elif self.retention_mode == "detach":
+                    await self.detach_old_partitions()
+            finally:
+                await lock.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MAINTENANCE_LOCK_ID})
+
+    async def ensure_partitions(self) -> None:
+        """Создаёт недостающие секции с текущего месяца на months_ahead вперёд"""
+        async with self.engine.begin() as conn:
+            await conn.execute(text("SELECT incidents_ensure_partitions(:months)"), {"months": self.months_ahead})
+
+    async def archive_resolved(self) -> int:
+        """Переносит решённые инциденты старше срока в incidents_archive; возвращает их число"""
+        cutoff = self._cutoff()
+        total = 0
+        while True:
+            async with self.engine.begin() as conn:
+                result = await conn.execute(text(ARCHIVE_BATCH), {"cutoff": cutoff, "batch_size": self.batch_size})
+            moved = result.rowcount
+            total += moved
+            archived_total.inc(moved)
+            if moved < self.batch_size:
+                break
+            await asyncio.sleep(self.batch_pause)
+
+        if total:
+            self.logger.info("В архив перенесено инцидентов: %s (созданы до %s)", total, cutoff.isoformat())
+        return total
+
+    async def detach_old_partitions(self) -> list[str]:
+        """Отсоединяет секции, целиком старше срока; возвращает имена архивных таблиц"""
+        cutoff = self._cutoff().date()
+        async with self.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            partitions = (await conn.execute(text("""
+                SELECT c.relname, i.inhdetachpending
+                FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'incidents'::regclass
+                ORDER BY c.relname
+            """))).all()
+            # секции, отсоединённые прошлым запуском, но не переименованные (например, после сбоя)
+            orphans = (await conn.scalars(text(r"""
+                SELECT relname FROM pg_class
+                WHERE relkind = 'r' AND NOT relispartition AND relname ~ '^incidents_p\d{4}_\d{2}$'
+            """))).all()
+
+            archived = [await self._archive_detached(name) for name in orphans]
+            for name, detach_pending in partitions:
+                end = _partition_end(name)
+                if end is None or end > cutoff:
+                    continue
+                # прерванный DETACH CONCURRENTLY завершается через FINALIZE
+                mode = "FINALIZE" if detach_pending else "CONCURRENTLY"
+                await conn.execute(text(f'ALTER TABLE incidents DETACH PARTITION "{name}" {mode}'))
+                detached_total.inc()
+                archived.append(await self._archive_detached(name))
+                await asyncio.sleep(self.batch_pause)
+
+        if archived:
+            self.logger.info("Отсоединены секции incidents: %s", ", ".join(archived))
+        return archived
+
+    async def _archive_detached(self, name: str) -> str:
+        """
+        Вычитает строки отсоединённой секции из счётчиков, освобождает их отпечатки
+        и переименовывает секцию в incidents_archive_*
+        """
+        archive_name = name.replace("incidents_p", "incidents_archive_p", 1)
+        async with self.engine.begin() as conn:
+            await conn.execute(text(SUBTRACT_COUNTERS.format(table=name)))
+            await conn.execute(text(RELEASE_FINGERPRINTS.format(table=name)))
+            # отсоединение не вызывает триггеров: процессы сбрасывают кэш и получают новую версию данных (ETag)
+            await conn.execute(text(
+                "SELECT pg_notify('incident_events', json_build_object("
+                "'event_id', nextval('incident_events_seq'), 'type', 'invalidate')::text)"
+            ))
+            await conn.execute(text(f'ALTER TABLE "{name}" RENAME TO "{archive_name}"'))
+        return archive_name
@@ -0,0 +1,74 @@
+"""
+Миграции схемы БД и проверка индексов горячих запросов.
+
+    python -m app.migrate            # применить новые миграции
+    python -m app.migrate status     # список миграций и их состояние
+    python -m app.migrate check      # горячие запросы IncidentService читают incidents по индексам
+"""
+from datetime import datetime, timezone
+from pathlib import Path
+import asyncio
+import sys
+
+from utils.ClassConfig import logger_config
+from utils.ClassMigrations import MigrationRunner, check_index_scans
+from app.database import engine
+from app.crud import STATEMENTS
+
+logger = logger_config.get_logger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "sql" / "migrations"
+
+runner = MigrationRunner(engine, MIGRATIONS_DIR, logger=logger)
+
+# Горячие запросы IncidentService с примерами параметров для проверки планов
+_CURSOR = {"cursor_created_at": datetime.now(timezone.utc), "cursor_id": 1}
+HOT_QUERY_PARAMS = {
+    "incidents_page": {"limit": 101},
+    "incidents_page_after": {"limit": 101, **_CURSOR},
+    "incidents_page_status": {"status": "new", "limit": 101},
+    "incidents_page_status_after": {"status": "new", "limit": 101, **_CURSOR},
+    "incident_update_status": {"status": "resolved", "id": 1},
+    "incident_counters": {"dimension": "status"},
+    "incidents_search": {"q": "ошибка", "limit": 101, "max_candidates": 5000},
+    "incidents_search_status_source_after": {
+        "q": "ошибка", "status": "new", "source": "monitoring", "cursor_rank": 0.1, "limit": 101,
+        "max_candidates": 5000, **_CURSOR,
+    },
+}
+
+
+async def check_hot_queries() -> dict[str, list[str]]:
+    """Горячие запросы, которым не хватает индекса: {имя: таблицы с Seq Scan}"""
+    queries = {name: (STATEMENTS[name], params) for name, params in HOT_QUERY_PARAMS.items()}
+    return await check_index_scans(engine, queries, tables=("incidents", "incident_counters"))
+
+
+async def main(command: str) -> int:
+    try:
+        match command:
+            case "up":
+                await runner.migrate()
+            case "status":
+                for migration in await runner.status():
+                    state = "applied" if migration["applied"] else "pending"
+                    if migration["modified"]:
+                        state += " (modified)"
+                    print(f"{migration['version']}_{migration['name']}: {state}")
+            case "check":
+                problems = await check_hot_queries()
+                for name, tables in problems.items():
+                    print(f"FAIL {name}: Seq Scan по {', '.join(tables)}")
+                if problems:
+                    return 1
+                print(f"OK: {len(HOT_QUERY_PARAMS)} горячих запросов используют индексы")
+            case _:
+                print(__doc__)
+                return 2
+        return 0
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "up")))
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum as SAEnum, func
+from sqlalchemy import CHAR, Column, Computed, Integer, String, DateTime, Enum as SAEnum, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from enum import Enum
 from app.database import Base
 
@@ -13,10 +14,23 @@ class IncidentSource(str, Enum):
     partner = "partner"
 
 class Incident(Base):
+    """
+    Описание таблицы incidents после миграций app/sql/migrations (схему создают и меняют только они).
+    Таблица секционирована по created_at (0003), поэтому первичный ключ — (id, created_at).
+    """
     __tablename__ = "incidents"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
-    id = Column(Integer, primary_key=True, index=True)
-    description = Column(String, nullable=False)
-    status = Column(SAEnum(IncidentStatus, name="incident_status"), nullable=False, server_default=IncidentStatus.new.value)
-    source = Column(SAEnum(IncidentSource, name="incident_source"), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    description = Column(String(1024), nullable=False)
+    status = Column(
+        SAEnum(IncidentStatus, native_enum=False, length=50), nullable=False, server_default=IncidentStatus.new.value
+    )
+    source = Column(SAEnum(IncidentSource, native_enum=False, length=50), nullable=False)
+    # полнотекстовый поиск (0004)
+    search_vector = Column(TSVECTOR, Computed("to_tsvector('russian', description)", persisted=True))
+    # дедупликация (0006)
+    fingerprint = Column(CHAR(64))
+    occurrences = Column(Integer, nullable=False, server_default="1")
+    last_seen_at = Column(DateTime(timezone=True))
@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+import asyncio
+import logging
+
+from utils.ClassMetrics import metrics
+
+
+# Ключ advisory lock пересчёта агрегатов (общий для всех процессов сервиса)
+ROLLUPS_LOCK_ID = 7_301_018
+
+rollup_hours_total = metrics.counter("incident_rollup_hours_total", "Пересчитанные часовые агрегаты инцидентов")
+rollup_dirty = metrics.gauge("incident_rollup_dirty_hours", "Часов с устаревшими агрегатами после пересчёта")
+
+# Часы старше горизонта, чей день уже свёрнут в дневной агрегат, больше не пересчитываются:
+# дневные агрегаты заморожены на момент сворачивания. Так перенос старых инцидентов в архив
+# не стирает историю, но и смена статуса инцидента старше горизонта в них не отражается.
+DROP_FROZEN_MARKS = """
+    DELETE FROM incident_rollup_dirty d
+    WHERE d.bucket < :horizon
+      AND EXISTS (
+          SELECT 1 FROM incident_rollups r
+          WHERE r.granularity = 'day' AND r.bucket = date_trunc('day', d.bucket, :tz)
+      )
+"""
+
+# Отметки собираются по часам: id прочитанных отметок удаляются после пересчёта
+SELECT_MARKS = """
+    SELECT bucket, array_agg(id) FROM incident_rollup_dirty
+    GROUP BY bucket
+    ORDER BY bucket
+    LIMIT :batch_size
+"""
+
+# Пересчёт часов: диапазонные выборки по (created_at, id) для каждого часа
+DELETE_HOURS = "DELETE FROM incident_rollups WHERE granularity = 'hour' AND bucket = ANY(:buckets)"
+INSERT_HOURS = """
+    INSERT INTO incident_rollups (granularity, bucket, source, status, count)
+    SELECT 'hour', hours.bucket, i.source, i.status, COUNT(*)
+    FROM unnest(CAST(:buckets AS TIMESTAMPTZ[])) AS hours(bucket)
+    JOIN incidents i ON i.created_at >= hours.bucket AND i.created_at < hours.bucket + INTERVAL '1 hour'
+    GROUP BY hours.bucket, i.source, i.status
+"""
+
+# Снимаются только прочитанные отметки: добавленные во время пересчёта остаются до следующего запуска
+DELETE_MARKS = "DELETE FROM incident_rollup_dirty WHERE id = ANY(:ids)"
+
+# Сворачивание часов старше горизонта (граница дня в часовом поясе приложения) в дневные агрегаты
+COMPACT_DAYS = """
+    INSERT INTO incident_rollups (granularity, bucket, source, status, count)
+    SELECT 'day', date_trunc('day', bucket, :tz), source, status, SUM(count)
+    FROM incident_rollups
+    WHERE granularity = 'hour' AND bucket < :horizon
+    GROUP BY 2, source, status
+    ON CONFLICT (granularity, bucket, source, status)
+    DO UPDATE SET count = incident_rollups.count + EXCLUDED.count
+"""
+DELETE_COMPACTED = "DELETE FROM incident_rollups WHERE granularity = 'hour' AND bucket < :horizon"
+
+
+class IncidentRollups:
+    """
+    Инкрементальный пересчёт агрегатов incident_rollups.
+    Триггеры incidents отмечают затронутые часы в incident_rollup_dirty; задача пересчитывает
+    отмеченные часы пачками по batch_size (с паузой batch_pause между пачками), а часы старше
+    hourly_retention_days дней сворачивает в дневные агрегаты (дни — в часовом поясе tz).
+    Свёрнутые дни не пересчитываются (см. DROP_FROZEN_MARKS).
+    Запуск пропускается, если пересчёт уже выполняет другой процесс (advisory lock).
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        tz: str = "UTC",
+        hourly_retention_days: int = 30,
+        batch_size: int = 500,
+        batch_pause: float = 0.1,
+        logger: logging.Logger | None = None,
+    ):
+        self.engine = engine
+        self.tz = tz
+        self.hourly_retention_days = hourly_retention_days
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.logger = logger or logging.getLogger(__name__)
+
+    async def _horizon(self, conn) -> datetime:
+        """Начало дня (в часовом поясе tz), раньше которого хранятся только дневные агрегаты"""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.hourly_retention_days)
+        return await conn.scalar(text("SELECT date_trunc('day', CAST(:cutoff AS TIMESTAMPTZ), :tz)"), {
+            "cutoff": cutoff, "tz": self.tz,
+        })
+
+    async def run(self) -> None:
+        """Один проход: пересчёт отмеченных часов и сворачивание старых в дни"""
+        async with self.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            if not await conn.scalar(text("SELECT pg_try_advisory_lock(:id)"), {"id": ROLLUPS_LOCK_ID}):
+                self.logger.info("Агрегаты инцидентов пересчитывает другой процесс, пропуск")
+                return
+            try:
+                horizon = await self._horizon(conn)
+                await conn.execute(text(DROP_FROZEN_MARKS), {"horizon": horizon, "tz": self.tz})
+                hours = await self.refresh(conn)
+                await self.compact(horizon)
+                rollup_dirty.set(await conn.scalar(text("SELECT COUNT(DISTINCT bucket) FROM incident_rollup_dirty")))
+                if hours:
+                    self.logger.info("Пересчитано часовых агрегатов инцидентов: %s", hours)
+            finally:
+                await conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": ROLLUPS_LOCK_ID})
+
+    async def refresh(self, conn) -> int:
+        """Пересчитывает все отмеченные часы; возвращает их число"""
+        total = 0
+        while True:
+            marks = (await conn.execute(text(SELECT_MARKS), {"batch_size": self.batch_size})).all()
+            if not marks:
+                break
+            buckets = [bucket for bucket, _ in marks]
+            async with self.engine.begin() as tx:
+                await tx.execute(text(DELETE_HOURS), {"buckets": buckets})
+                await tx.execute(text(INSERT_HOURS), {"buckets": buckets})
+
+            # триггеры только добавляют отметки, поэтому удаление прочитанных не ждёт записей
+            ids = [mark_id for _, mark_ids in marks for mark_id in mark_ids]
+            removed = (await conn.execute(text(DELETE_MARKS), {"ids": ids})).rowcount
+            total += len(marks)
+            rollup_hours_total.inc(len(marks))
+
+            # отметки, добавленные во время пересчёта, остались — их пересчитает следующий запуск
+            if len(marks) < self.batch_size or removed == 0:
+                break
+            await asyncio.sleep(self.batch_pause)
+        return total
+
+    async def compact(self, horizon: datetime) -> None:
+        """Сворачивает часовые агрегаты до horizon в дневные"""
+        async with self.engine.begin() as tx:
+            await tx.execute(text(COMPACT_DAYS), {"horizon": horizon, "tz": self.tz})
+            await tx.execute(text(DELETE_COMPACTED), {"horizon": horizon})
@@ -1,12 +1,17 @@
 from datetime import datetime
+from typing import List
+from typing_extensions import TypedDict
 from zoneinfo import ZoneInfo
 from pydantic import Field
 from pydantic_settings import SettingsConfigDict
 from pydantic import computed_field
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from app.models import IncidentStatus, IncidentSource
 from utils.ClassConfig import settings
 
+# Часовой пояс приложения (создаётся один раз, а не на каждый экземпляр)
+APP_TZ = ZoneInfo(settings.TIMEZONE)
+
 
 class IncidentCreate(BaseModel):
     description: str = Field(..., min_length=1, max_length=1024)
@@ -25,10 +30,137 @@ class IncidentOut(BaseModel):
     status: IncidentStatus
     source: IncidentSource
     created_at: datetime
+    occurrences: int = 1
+    last_seen_at: datetime | None = None
 
     @computed_field
     def created_at_local(self) -> datetime:
         """Возвращает время в зоне приложения (например, Europe/Moscow)"""
-        return self.created_at.astimezone(ZoneInfo(settings.TIMEZONE))
+        return self.created_at.astimezone(APP_TZ)
 
     model_config = SettingsConfigDict(from_attributes=True)
+
+
+class IncidentAccepted(BaseModel):
+    """
+    Инцидент принят в очередь отложенной записи.
+    ticket — непрозрачный идентификатор для корреляции с логами сервиса; по нему нельзя запросить инцидент.
+    """
+    ticket: str
+    status: str = "accepted"
+
+
+class IncidentPage(BaseModel):
+    """Страница инцидентов с курсором на следующую страницу"""
+    items: List[IncidentOut]
+    next_cursor: str | None = None
+
+
+class IncidentSearchHit(IncidentOut):
+    """Инцидент из результатов поиска с оценкой релевантности"""
+    rank: float
+
+
+class IncidentSearchPage(BaseModel):
+    """Страница результатов поиска с курсором на следующую страницу"""
+    items: List[IncidentSearchHit]
+    next_cursor: str | None = None
+
+
+class TimeseriesPoint(BaseModel):
+    """Число инцидентов, созданных в корзине времени, по источнику и текущему статусу"""
+    bucket: datetime
+    source: str
+    status: str
+    count: int
+
+
+# --- Быстрая сериализация строк БД в JSON (без валидации через IncidentOut) ---
+
+class IncidentRow(TypedDict):
+    """Инцидент в том же виде и порядке полей, что и IncidentOut в JSON"""
+    id: int
+    description: str
+    status: str
+    source: str
+    created_at: datetime
+    occurrences: int
+    last_seen_at: datetime | None
+    created_at_local: datetime
+
+
+class IncidentPageRows(TypedDict):
+    items: List[IncidentRow]
+    next_cursor: str | None
+
+
+class IncidentSearchRow(TypedDict):
+    """Результат поиска в порядке полей IncidentSearchHit: вычисляемое created_at_local идёт после rank"""
+    id: int
+    description: str
+    status: str
+    source: str
+    created_at: datetime
+    occurrences: int
+    last_seen_at: datetime | None
+    rank: float
+    created_at_local: datetime
+
+
+class IncidentSearchPageRows(TypedDict):
+    items: List[IncidentSearchRow]
+    next_cursor: str | None
+
+
+incident_row_adapter = TypeAdapter(IncidentRow)
+incident_rows_adapter = TypeAdapter(List[IncidentRow])
+incident_page_adapter = TypeAdapter(IncidentPageRows)
+incident_search_page_adapter = TypeAdapter(IncidentSearchPageRows)
+
+
+def to_incident_row(row) -> IncidentRow:
+    """Строка БД (mapping) -> IncidentRow с вычисленным created_at_local"""
+    return {
+        "id": row["id"],
+        "description": row["description"],
+        "status": row["status"],
+        "source": row["source"],
+        "created_at": row["created_at"],
+        "occurrences": row["occurrences"],
+        "last_seen_at": row["last_seen_at"],
+        "created_at_local": row["created_at"].astimezone(APP_TZ),
+    }
+
+
+def to_search_row(row) -> IncidentSearchRow:
+    """Строка результата поиска -> IncidentSearchRow"""
+    return {
+        "id": row["id"],
+        "description": row["description"],
+        "status": row["status"],
+        "source": row["source"],
+        "created_at": row["created_at"],
+        "occurrences": row["occurrences"],
+        "last_seen_at": row["last_seen_at"],
+        "rank": row["rank"],
+        "created_at_local": row["created_at"].astimezone(APP_TZ),
+    }
+
+
+def dump_incident_page(page: dict) -> bytes:
+    """
+    JSON страницы инцидентов напрямую из строк БД через сериализатор pydantic-core.
+    Результат совпадает с сериализацией IncidentPage, но без построения моделей.
+    """
+    return incident_page_adapter.dump_json({
+        "items": [to_incident_row(row) for row in page["items"]],
+        "next_cursor": page["next_cursor"],
+    })
+
+
+def dump_search_page(page: dict) -> bytes:
+    """JSON страницы результатов поиска (как IncidentSearchPage) напрямую из строк БД"""
+    return incident_search_page_adapter.dump_json({
+        "items": [to_search_row(row) for row in page["items"]],
+        "next_cursor": page["next_cursor"],
+    })
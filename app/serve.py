@@ -0,0 +1,104 @@
+"""
+Запуск сервиса в нескольких процессах uvicorn.
+
+    python -m app.serve
+
+Число процессов — WEB_WORKERS (0 — по числу доступных CPU с учётом квоты контейнера).
+При DB_CONNECTION_BUDGET > 0 число процессов уменьшается так, чтобы все процессы вместе открывали
+к primary не больше budget соединений (пул DB_POOL_SIZE + DB_MAX_OVERFLOW уменьшается, только если
+его не хватает и одному процессу).
+Миграции и singleton-задачи выполняет процесс-лидер (advisory lock, см. app/main.py).
+С DEBUG=true — один процесс с автоперезагрузкой.
+"""
+import math
+import os
+
+import uvicorn
+
+from utils.ClassConfig import settings, logger_config
+
+logger = logger_config.get_logger(__name__)
+
+# Соединения процесса вне пула: LISTEN ленты инцидентов, advisory lock лидера и проверка здоровья
+RESERVED_CONNECTIONS = 3
+# Минимальный пул процесса (DB_POOL_SIZE + DB_MAX_OVERFLOW): свёртки временных рядов держат
+# два соединения одновременно, обслуживание секций в режиме detach — три
+MIN_POOL_CONNECTIONS = 3
+
+
+def available_cpus() -> int:
+    """CPU, доступные процессу: affinity и квота cgroup v2 (docker --cpus)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def plan_workers(workers: int, budget: int, pool_size: int, max_overflow: int) -> tuple[int, int, int]:
+    """
+    Число процессов и пул одного процесса (workers, pool_size, max_overflow) в пределах budget
+    соединений к primary. Сначала уменьшается число процессов; пул уменьшается (с сохранением
+    соотношения pool_size : max_overflow, но не ниже MIN_POOL_CONNECTIONS), только если полного пула
+    не хватает и одному процессу. ValueError — пул или бюджет меньше минимума одного процесса.
+    """
+    pool = pool_size + max_overflow
+    if pool < MIN_POOL_CONNECTIONS:
+        raise ValueError(
+            f"DB_POOL_SIZE + DB_MAX_OVERFLOW = {pool}: процессу нужно не меньше {MIN_POOL_CONNECTIONS} соединений пула"
+        )
+    if budget <= 0:
+        return workers, pool_size, max_overflow
+
+    if budget >= pool + RESERVED_CONNECTIONS:
+        return min(workers, budget // (pool + RESERVED_CONNECTIONS)), pool_size, max_overflow
+
+    available = budget - RESERVED_CONNECTIONS
+    if available < MIN_POOL_CONNECTIONS:
+        raise ValueError(
+            f"DB_CONNECTION_BUDGET = {budget}: одному процессу нужно не меньше "
+            f"{MIN_POOL_CONNECTIONS + RESERVED_CONNECTIONS} соединений"
+        )
+    size = max(1, available * pool_size // pool)
+    return 1, size, available - size
+
+
+def main() -> None:
+    workers = 1 if settings.DEBUG else settings.WEB_WORKERS or available_cpus()
+    try:
+        workers, pool_size, max_overflow = plan_workers(
+            workers, settings.DB_CONNECTION_BUDGET, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+        )
+    except ValueError as e:
+        logger.error("Запуск невозможен: %s", e)
+        raise SystemExit(1) from e
+    # Отдельные процессы uvicorn (workers > 1, reload) создают настройки заново из окружения,
+    # а один процесс импортирует app.main здесь же — с уже созданным settings, поэтому меняем и его
+    os.environ["DB_POOL_SIZE"] = str(pool_size)
+    os.environ["DB_MAX_OVERFLOW"] = str(max_overflow)
+    settings.DB_POOL_SIZE = pool_size
+    settings.DB_MAX_OVERFLOW = max_overflow
+    logger.info(
+        "Запуск %s процессов: пул %s + %s соединений на процесс (бюджет соединений: %s)",
+        workers, pool_size, max_overflow, settings.DB_CONNECTION_BUDGET or "не задан",
+    )
+
+    uvicorn.run(
+        "app.main:app",
+        host=settings.WEB_HOST,
+        port=settings.WEB_PORT,
+        workers=workers,
+        reload=settings.DEBUG,
+        timeout_graceful_shutdown=settings.WEB_GRACEFUL_SHUTDOWN,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+-- Начальная схема: таблица incidents и счётчики incident_counters с триггерами
+
+CREATE TABLE IF NOT EXISTS incidents (
+    id SERIAL PRIMARY KEY,
+    description VARCHAR(1024) NOT NULL,
+    status VARCHAR(50) NOT NULL DEFAULT 'new',
+    source VARCHAR(50) NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+
+-- --- Счётчики инцидентов по статусу и источнику ---
+-- Поддерживаются триггерами в той же транзакции, что и запись в incidents,
+-- поэтому /incidents/monitoring читает несколько строк вместо агрегата по всей таблице.
+CREATE TABLE IF NOT EXISTS incident_counters (
+    dimension VARCHAR(20) NOT NULL,     -- 'status' или 'source'
+    key VARCHAR(50) NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, key)
+);
+
+-- Триггеры уровня оператора с transition tables: один upsert на ключ за оператор,
+-- а не на каждую строку (важно для пакетной вставки и COPY).
+-- Ключи обновляются в фиксированном порядке, чтобы параллельные транзакции не взаимоблокировались.
+CREATE OR REPLACE FUNCTION incident_counters_refresh() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO incident_counters (dimension, key, count)
+        SELECT dimension, key, SUM(delta)
+        FROM (
+            SELECT 'status' AS dimension, status AS key, 1 AS delta FROM new_rows
+            UNION ALL
+            SELECT 'source', source, 1 FROM new_rows
+        ) deltas
+        GROUP BY dimension, key
+        ORDER BY dimension, key
+        ON CONFLICT (dimension, key) DO UPDATE SET count = incident_counters.count + EXCLUDED.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO incident_counters (dimension, key, count)
+        SELECT dimension, key, SUM(delta)
+        FROM (
+            SELECT 'status' AS dimension, status AS key, -1 AS delta FROM old_rows
+            UNION ALL
+            SELECT 'source', source, -1 FROM old_rows
+        ) deltas
+        GROUP BY dimension, key
+        ORDER BY dimension, key
+        ON CONFLICT (dimension, key) DO UPDATE SET count = incident_counters.count + EXCLUDED.count;
+    ELSE
+        INSERT INTO incident_counters (dimension, key, count)
+        SELECT dimension, key, SUM(delta)
+        FROM (
+            SELECT 'status' AS dimension, status AS key, 1 AS delta FROM new_rows
+            UNION ALL
+            SELECT 'source', source, 1 FROM new_rows
+            UNION ALL
+            SELECT 'status', status, -1 FROM old_rows
+            UNION ALL
+            SELECT 'source', source, -1 FROM old_rows
+        ) deltas
+        GROUP BY dimension, key
+        HAVING SUM(delta) <> 0
+        ORDER BY dimension, key
+        ON CONFLICT (dimension, key) DO UPDATE SET count = incident_counters.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS incident_counters_insert ON incidents;
+CREATE TRIGGER incident_counters_insert
+    AFTER INSERT ON incidents
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION incident_counters_refresh();
+
+DROP TRIGGER IF EXISTS incident_counters_update ON incidents;
+CREATE TRIGGER incident_counters_update
+    AFTER UPDATE ON incidents
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION incident_counters_refresh();
+
+DROP TRIGGER IF EXISTS incident_counters_delete ON incidents;
+CREATE TRIGGER incident_counters_delete
+    AFTER DELETE ON incidents
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION incident_counters_refresh();
+
+-- Первичное заполнение счётчиков по уже существующим инцидентам
+INSERT INTO incident_counters (dimension, key, count)
+SELECT dimension, key, count
+FROM (
+    SELECT 'status' AS dimension, status AS key, COUNT(*) AS count FROM incidents GROUP BY status
+    UNION ALL
+    SELECT 'source', source, COUNT(*) FROM incidents GROUP BY source
+) totals
+WHERE NOT EXISTS (SELECT 1 FROM incident_counters);
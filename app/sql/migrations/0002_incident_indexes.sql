@@ -0,0 +1,16 @@
+-- migrate:no-transaction
+-- Индексы горячих запросов IncidentService. CONCURRENTLY не блокирует запись в incidents,
+-- но не выполняется в транзакции, поэтому каждый оператор идёт отдельно и идемпотентен.
+
+-- Список страницами и выгрузка: ORDER BY created_at, id (в обе стороны) и keyset-курсор
+CREATE INDEX CONCURRENTLY IF NOT EXISTS incidents_created_at_id_idx
+    ON incidents (created_at, id);
+
+-- Фильтр по статусу (список, выгрузка): status ведущей колонкой, далее порядок страницы
+CREATE INDEX CONCURRENTLY IF NOT EXISTS incidents_status_created_at_id_idx
+    ON incidents (status, created_at, id);
+
+-- Открытые инциденты (new, in_progress) — небольшая и самая востребованная часть таблицы
+CREATE INDEX CONCURRENTLY IF NOT EXISTS incidents_open_created_at_id_idx
+    ON incidents (created_at, id)
+    WHERE status <> 'resolved';
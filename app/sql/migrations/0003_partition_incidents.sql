@@ -0,0 +1,98 @@
+-- Помесячное секционирование incidents по created_at (RANGE).
+-- Таблица пересоздаётся секционированной, данные копируются в одной транзакции
+-- (на время миграции incidents заблокирована). Первичный ключ секционированной таблицы
+-- обязан включать ключ секционирования, поэтому он становится (id, created_at); id по-прежнему
+-- выдаёт последовательность incidents_id_seq.
+
+-- Секция incidents_pYYYY_MM на месяц, содержащий for_month (границы месяцев по UTC)
+CREATE OR REPLACE FUNCTION incidents_create_partition(for_month DATE) RETURNS TEXT AS $$
+DECLARE
+    start_at DATE := date_trunc('month', for_month)::DATE;
+    partition_name TEXT := format('incidents_p%s', to_char(start_at, 'YYYY_MM'));
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF incidents FOR VALUES FROM (%L) TO (%L)',
+        partition_name,
+        start_at::TIMESTAMP AT TIME ZONE 'UTC',
+        (start_at + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC'
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Секции с текущего месяца на months_ahead месяцев вперёд (вызывается фоновым обслуживанием)
+CREATE OR REPLACE FUNCTION incidents_ensure_partitions(months_ahead INTEGER) RETURNS VOID AS $$
+DECLARE
+    current_month DATE := date_trunc('month', NOW() AT TIME ZONE 'UTC')::DATE;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        PERFORM incidents_create_partition((current_month + make_interval(months => i))::DATE);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE incidents RENAME TO incidents_unpartitioned;
+ALTER SEQUENCE incidents_id_seq OWNED BY NONE;
+
+CREATE TABLE incidents (
+    id INTEGER NOT NULL DEFAULT nextval('incidents_id_seq'),
+    description VARCHAR(1024) NOT NULL,
+    status VARCHAR(50) NOT NULL DEFAULT 'new',
+    source VARCHAR(50) NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE incidents_id_seq OWNED BY incidents.id;
+
+-- Секции для уже существующих данных и на 3 месяца вперёд
+DO $$
+DECLARE
+    partition_month DATE;
+BEGIN
+    FOR partition_month IN
+        SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC')::DATE FROM incidents_unpartitioned
+    LOOP
+        PERFORM incidents_create_partition(partition_month);
+    END LOOP;
+    PERFORM incidents_ensure_partitions(3);
+END;
+$$;
+
+-- Копирование до создания триггеров: счётчики incident_counters уже учитывают эти строки
+INSERT INTO incidents (id, description, status, source, created_at)
+SELECT id, description, status, source, created_at FROM incidents_unpartitioned;
+
+DROP TABLE incidents_unpartitioned;
+
+-- Индексы создаются на каждой секции (на секционированной таблице CONCURRENTLY недоступен)
+CREATE INDEX incidents_created_at_id_idx ON incidents (created_at, id);
+CREATE INDEX incidents_status_created_at_id_idx ON incidents (status, created_at, id);
+CREATE INDEX incidents_open_created_at_id_idx ON incidents (created_at, id) WHERE status <> 'resolved';
+
+-- Триггеры уровня оператора на секционированной таблице видят строки всех секций
+CREATE TRIGGER incident_counters_insert
+    AFTER INSERT ON incidents
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION incident_counters_refresh();
+
+CREATE TRIGGER incident_counters_update
+    AFTER UPDATE ON incidents
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION incident_counters_refresh();
+
+CREATE TRIGGER incident_counters_delete
+    AFTER DELETE ON incidents
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION incident_counters_refresh();
+
+-- Архив решённых инцидентов, перенесённых фоновым retention
+CREATE TABLE IF NOT EXISTS incidents_archive (
+    id INTEGER NOT NULL,
+    description VARCHAR(1024) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    source VARCHAR(50) NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+);
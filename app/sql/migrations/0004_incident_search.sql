@@ -0,0 +1,8 @@
+-- Полнотекстовый поиск по описанию инцидента.
+-- Конфигурация russian разбирает и русские, и английские слова (со стеммингом).
+-- Добавление STORED-колонки переписывает все секции incidents (таблица заблокирована на время миграции);
+-- индекс на секционированной таблице создаётся на каждой секции, новые секции получают его автоматически.
+ALTER TABLE incidents ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (to_tsvector('russian', description)) STORED;
+
+CREATE INDEX IF NOT EXISTS incidents_search_vector_idx ON incidents USING GIN (search_vector);
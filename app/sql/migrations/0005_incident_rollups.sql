@@ -0,0 +1,62 @@
+-- Агрегаты инцидентов по времени для дашбордов: число инцидентов, созданных за час (или день),
+-- по источнику и текущему статусу. Часовые агрегаты пересчитывает фоновая задача,
+-- старые часы сворачиваются в дневные.
+CREATE TABLE IF NOT EXISTS incident_rollups (
+    granularity VARCHAR(8) NOT NULL,    -- 'hour' или 'day'
+    bucket TIMESTAMPTZ NOT NULL,        -- начало часа (UTC) или дня (в часовом поясе приложения)
+    source VARCHAR(50) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (granularity, bucket, source, status)
+);
+
+-- Часы, агрегаты которых устарели. Отметки только добавляются (одна строка на час за оператор):
+-- одновременные записи в текущий час не обновляют общую строку и не ждут друг друга.
+-- Задача удаляет только прочитанные ею отметки, поэтому изменения во время пересчёта не теряются.
+CREATE TABLE IF NOT EXISTS incident_rollup_dirty (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    bucket TIMESTAMPTZ NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_incident_rollup_dirty_bucket ON incident_rollup_dirty (bucket);
+
+-- Отметка часов, затронутых оператором: одна строка на час, а не на каждый инцидент.
+-- UPDATE отмечает час, только если у инцидента изменился статус.
+CREATE OR REPLACE FUNCTION incident_rollups_mark() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO incident_rollup_dirty (bucket)
+        SELECT DISTINCT date_trunc('hour', created_at, 'UTC') FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO incident_rollup_dirty (bucket)
+        SELECT DISTINCT date_trunc('hour', created_at, 'UTC') FROM old_rows;
+    ELSE
+        INSERT INTO incident_rollup_dirty (bucket)
+        SELECT DISTINCT date_trunc('hour', new_rows.created_at, 'UTC')
+        FROM new_rows JOIN old_rows USING (id, created_at)
+        WHERE new_rows.status IS DISTINCT FROM old_rows.status;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS incident_rollups_insert ON incidents;
+CREATE TRIGGER incident_rollups_insert
+    AFTER INSERT ON incidents
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION incident_rollups_mark();
+
+DROP TRIGGER IF EXISTS incident_rollups_update ON incidents;
+CREATE TRIGGER incident_rollups_update
+    AFTER UPDATE ON incidents
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION incident_rollups_mark();
+
+DROP TRIGGER IF EXISTS incident_rollups_delete ON incidents;
+CREATE TRIGGER incident_rollups_delete
+    AFTER DELETE ON incidents
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION incident_rollups_mark();
+
+-- Первичное заполнение: все часы с существующими инцидентами пересчитает фоновая задача
+INSERT INTO incident_rollup_dirty (bucket)
+SELECT DISTINCT date_trunc('hour', created_at, 'UTC') FROM incidents;
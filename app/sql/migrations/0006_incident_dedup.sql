@@ -0,0 +1,48 @@
+-- Дедупликация повторяющихся инцидентов по отпечатку (нормализованное описание + источник).
+-- Повтор открытого инцидента увеличивает occurrences и last_seen_at вместо новой строки.
+-- Значения по умолчанию без перезаписи таблицы (fast default).
+ALTER TABLE incidents ADD COLUMN IF NOT EXISTS fingerprint CHAR(64);
+ALTER TABLE incidents ADD COLUMN IF NOT EXISTS occurrences INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE incidents ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMPTZ;
+
+ALTER TABLE incidents_archive ADD COLUMN IF NOT EXISTS occurrences INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE incidents_archive ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMPTZ;
+
+-- Уникальный индекс по отпечатку на секционированной incidents невозможен (он обязан включать
+-- created_at), поэтому открытые инциденты с отпечатком учитываются в отдельной таблице:
+-- её первичный ключ и есть цель INSERT ... ON CONFLICT (fingerprint).
+CREATE TABLE IF NOT EXISTS incident_fingerprints (
+    fingerprint CHAR(64) PRIMARY KEY,
+    incident_id INTEGER NOT NULL,
+    incident_created_at TIMESTAMPTZ NOT NULL
+);
+
+-- Решённый или удалённый инцидент освобождает отпечаток: следующий повтор создаст новый инцидент
+CREATE OR REPLACE FUNCTION incident_fingerprints_release() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM incident_fingerprints f
+        USING old_rows o
+        WHERE o.fingerprint IS NOT NULL AND f.fingerprint = o.fingerprint
+          AND f.incident_id = o.id AND f.incident_created_at = o.created_at;
+    ELSE
+        DELETE FROM incident_fingerprints f
+        USING new_rows n
+        WHERE n.fingerprint IS NOT NULL AND n.status = 'resolved' AND f.fingerprint = n.fingerprint
+          AND f.incident_id = n.id AND f.incident_created_at = n.created_at;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS incident_fingerprints_update ON incidents;
+CREATE TRIGGER incident_fingerprints_update
+    AFTER UPDATE ON incidents
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION incident_fingerprints_release();
+
+DROP TRIGGER IF EXISTS incident_fingerprints_delete ON incidents;
+CREATE TRIGGER incident_fingerprints_delete
+    AFTER DELETE ON incidents
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION incident_fingerprints_release();
@@ -0,0 +1,49 @@
+-- Лента изменений инцидентов: уведомление NOTIFY incident_events на создание инцидента и смену статуса.
+-- event_id из последовательности — по нему клиент ленты продолжает с последнего полученного события.
+-- status_changed несёт прежний статус (old_status): подписчик с фильтром по статусу узнаёт
+-- и об инцидентах, которые из этого статуса вышли.
+CREATE SEQUENCE IF NOT EXISTS incident_events_seq;
+
+CREATE OR REPLACE FUNCTION incident_events_notify() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('incident_events', json_build_object(
+            'event_id', nextval('incident_events_seq'),
+            'type', 'created',
+            'incident', json_build_object(
+                'id', n.id, 'description', n.description, 'status', n.status, 'source', n.source,
+                'created_at', n.created_at, 'occurrences', n.occurrences, 'last_seen_at', n.last_seen_at
+            )
+        )::text)
+        FROM (SELECT * FROM new_rows ORDER BY id) n;
+    ELSE
+        PERFORM pg_notify('incident_events', json_build_object(
+            'event_id', nextval('incident_events_seq'),
+            'type', 'status_changed',
+            'old_status', n.old_status,
+            'incident', json_build_object(
+                'id', n.id, 'description', n.description, 'status', n.status, 'source', n.source,
+                'created_at', n.created_at, 'occurrences', n.occurrences, 'last_seen_at', n.last_seen_at
+            )
+        )::text)
+        FROM (
+            SELECT new_rows.*, old_rows.status AS old_status FROM new_rows JOIN old_rows USING (id, created_at)
+            WHERE new_rows.status IS DISTINCT FROM old_rows.status
+            ORDER BY new_rows.id
+        ) n;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS incident_events_insert ON incidents;
+CREATE TRIGGER incident_events_insert
+    AFTER INSERT ON incidents
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION incident_events_notify();
+
+DROP TRIGGER IF EXISTS incident_events_update ON incidents;
+CREATE TRIGGER incident_events_update
+    AFTER UPDATE ON incidents
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION incident_events_notify();
@@ -0,0 +1,66 @@
+-- Уведомление invalidate в канале incident_events: данные incidents изменились без события ленты
+-- (удаление, обновление без смены статуса — например, повторы дедупликации). По нему процессы
+-- убирают из кэша инциденты ids; если строк больше 500 (предел размера уведомления — 8000 байт),
+-- ids не передаются, и кэш инцидентов сбрасывается целиком. Номер из incident_events_seq, как и у
+-- событий ленты: номер последнего полученного уведомления — общая для процессов версия данных (ETag).
+CREATE OR REPLACE FUNCTION incident_invalidate_notify(ids integer[]) RETURNS void AS $$
+BEGIN
+    IF ids IS NOT NULL THEN
+        PERFORM pg_notify('incident_events', json_build_object(
+            'event_id', nextval('incident_events_seq'),
+            'type', 'invalidate',
+            'ids', CASE WHEN cardinality(ids) <= 500 THEN ids END
+        )::text);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION incident_events_notify() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('incident_events', json_build_object(
+            'event_id', nextval('incident_events_seq'),
+            'type', 'created',
+            'incident', json_build_object(
+                'id', n.id, 'description', n.description, 'status', n.status, 'source', n.source,
+                'created_at', n.created_at, 'occurrences', n.occurrences, 'last_seen_at', n.last_seen_at
+            )
+        )::text)
+        FROM (SELECT * FROM new_rows ORDER BY id) n;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM incident_invalidate_notify(
+            (SELECT array_agg(id) FROM (SELECT id FROM old_rows LIMIT 501) o)
+        );
+    ELSE
+        PERFORM pg_notify('incident_events', json_build_object(
+            'event_id', nextval('incident_events_seq'),
+            'type', 'status_changed',
+            'old_status', n.old_status,
+            'incident', json_build_object(
+                'id', n.id, 'description', n.description, 'status', n.status, 'source', n.source,
+                'created_at', n.created_at, 'occurrences', n.occurrences, 'last_seen_at', n.last_seen_at
+            )
+        )::text)
+        FROM (
+            SELECT new_rows.*, old_rows.status AS old_status FROM new_rows JOIN old_rows USING (id, created_at)
+            WHERE new_rows.status IS DISTINCT FROM old_rows.status
+            ORDER BY new_rows.id
+        ) n;
+
+        PERFORM incident_invalidate_notify((
+            SELECT array_agg(id) FROM (
+                SELECT new_rows.id FROM new_rows JOIN old_rows USING (id, created_at)
+                WHERE new_rows.status IS NOT DISTINCT FROM old_rows.status
+                LIMIT 501
+            ) o
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS incident_events_delete ON incidents;
+CREATE TRIGGER incident_events_delete
+    AFTER DELETE ON incidents
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION incident_events_notify();
@@ -0,0 +1,62 @@
+"""
+Микробенчмарк сериализации страниц инцидентов: прежний путь через модели
+(model_validate + jsonable_encoder + json.dumps, как в JSONResponse) против
+TypeAdapter над TypedDict (app/schemas.py). Проверяет, что JSON совпадает побайтно.
+БД не нужна, настройки читаются из .env как у приложения.
+
+    python -m benchmarks.bench_incident_json [строк на странице] [повторов]
+"""
+from datetime import datetime, timedelta, timezone
+import json
+import sys
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+
+from app.schemas import IncidentPage, IncidentSearchPage, dump_incident_page, dump_search_page
+
+
+def make_rows(count: int, with_rank: bool = False) -> list[dict]:
+    """Строки в виде, в котором их возвращает DBQueries.run_named (dict по колонкам)"""
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(count):
+        row = {
+            "id": i + 1,
+            "description": f"Ошибка подключения к платёжному шлюзу #{i}",
+            "status": ("new", "in_progress", "resolved")[i % 3],
+            "source": ("operator", "monitoring", "partner")[i % 3],
+            "created_at": start + timedelta(seconds=i),
+            "occurrences": 1 + i % 5,
+            "last_seen_at": start + timedelta(seconds=i + 60) if i % 2 else None,
+        }
+        if with_rank:
+            row["rank"] = 1.0 / (i + 1)
+        rows.append(row)
+    return rows
+
+
+def via_models(model, page: dict) -> bytes:
+    content = jsonable_encoder(model.model_validate(page))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def compare(title: str, model, dump, page: dict, number: int) -> None:
+    assert via_models(model, page) == dump(page), f"{title}: JSON отличается"
+    before = timeit.timeit(lambda: via_models(model, page), number=number) / number
+    after = timeit.timeit(lambda: dump(page), number=number) / number
+    print(f"{title} (JSON совпадает): модели {before * 1000:.2f} мс, TypeAdapter {after * 1000:.2f} мс, x{before / after:.1f}")
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    number = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    print(f"Страница {rows} строк, {number} повторов")
+    compare("GET /incidents", IncidentPage, dump_incident_page,
+            {"items": make_rows(rows), "next_cursor": "cursor"}, number)
+    compare("GET /incidents/search", IncidentSearchPage, dump_search_page,
+            {"items": make_rows(rows, with_rank=True), "next_cursor": None}, number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Маршрутизация чтений: ReplicaRouter и DBQueries._route_read (primary + реплика, см. conftest.py)"""
+from sqlalchemy.ext.asyncio import create_async_engine
+import pytest
+
+from app.database import ReplicaRouter
+from utils.ClassSQL import PRIMARY_PINNED, READ_REPLICA
+
+
+SERVER = "SELECT current_setting('application_name')"
+
+
+async def served_by(cluster, db, **kwargs) -> str:
+    """application_name соединения, на котором выполнено чтение"""
+    return await cluster.queries.run_select(db, SERVER, mode="scalar", **kwargs)
+
+
+# --- ReplicaRouter (без БД) ---
+
+def make_router(count: int, eject_seconds: float = 30.0) -> ReplicaRouter:
+    engines = [create_async_engine(f"postgresql+asyncpg://u:p@replica-{i}/db") for i in range(count)]
+    return ReplicaRouter(engines, eject_seconds)
+
+
+def test_pick_round_robin():
+    router = make_router(3)
+    first, second, third = router.engines
+    assert [router.pick() for _ in range(6)] == [first, second, third, first, second, third]
+
+
+def test_ejected_replica_is_skipped_until_restored():
+    router = make_router(2)
+    first, second = router.engines
+    router.eject(first, OSError("connection refused"))
+    assert [router.pick() for _ in range(3)] == [second, second, second]
+    assert router.healthy_count() == 1
+
+    router.restore(first)
+    assert {router.pick(), router.pick()} == {first, second}
+
+
+def test_ejection_expires():
+    router = make_router(1, eject_seconds=0.0)
+    replica, = router.engines
+    router.eject(replica)
+    assert router.pick() is replica
+
+
+def test_pick_none_when_all_ejected():
+    router = make_router(2)
+    for replica in router.engines:
+        router.eject(replica)
+    assert router.pick() is None
+    assert router.healthy_count() == 0
+
+
+# --- DBQueries._route_read (primary + реплика) ---
+
+@pytest.mark.anyio
+async def test_reads_go_to_replicas_round_robin(cluster):
+    router = ReplicaRouter(cluster.replicas, eject_seconds=30.0)
+    async with cluster.sessions(router)() as db:
+        served = [await served_by(cluster, db) for _ in range(4)]
+        assert db.info[READ_REPLICA] is cluster.replicas[1]
+    assert served == ["replica-1", "replica-2", "replica-1", "replica-2"]
+
+
+@pytest.mark.anyio
+async def test_named_reads_go_to_replica(cluster):
+    cluster.queries.statements.register("server", SERVER)
+    router = ReplicaRouter(cluster.replicas[:1], eject_seconds=30.0)
+    async with cluster.sessions(router)() as db:
+        assert await cluster.queries.run_named(db, "server", mode="scalar") == "replica-1"
+        assert await cluster.queries.run_named(db, "server", mode="scalar", use_primary=True) == "primary"
+
+
+@pytest.mark.anyio
+async def test_use_primary_bypasses_replicas(cluster):
+    router = ReplicaRouter(cluster.replicas, eject_seconds=30.0)
+    async with cluster.sessions(router)() as db:
+        assert await served_by(cluster, db, use_primary=True) == "primary"
+        assert READ_REPLICA not in db.info
+
+
+@pytest.mark.anyio
+async def test_failed_replica_is_ejected_and_read_falls_back_to_primary(cluster):
+    router = ReplicaRouter([cluster.dead, cluster.replicas[0]], eject_seconds=30.0)
+    async with cluster.sessions(router)() as db:
+        assert await served_by(cluster, db) == "primary"
+        assert READ_REPLICA not in db.info
+    assert router.healthy_count() == 1
+
+    # исключённая реплика пропускается: следующие чтения идут на оставшуюся
+    async with cluster.sessions(router)() as db:
+        assert [await served_by(cluster, db) for _ in range(2)] == ["replica-1", "replica-1"]
+
+
+@pytest.mark.anyio
+async def test_all_replicas_ejected_reads_from_primary(cluster):
+    router = ReplicaRouter(cluster.replicas, eject_seconds=30.0)
+    for replica in cluster.replicas:
+        router.eject(replica)
+    async with cluster.sessions(router)() as db:
+        assert await served_by(cluster, db) == "primary"
+
+
+@pytest.mark.anyio
+async def test_reads_after_write_are_pinned_to_primary(cluster):
+    router = ReplicaRouter(cluster.replicas, eject_seconds=30.0)
+    sessions = cluster.sessions(router)
+    async with sessions() as db:
+        assert await served_by(cluster, db) == "replica-1"
+        await cluster.queries.run_update(db, "UPDATE incidents SET status = status WHERE false", commit=False)
+        assert db.info[PRIMARY_PINNED] is True
+        assert [await served_by(cluster, db) for _ in range(2)] == ["primary", "primary"]
+        await db.rollback()
+
+    # метка записи живёт только в своей сессии
+    async with sessions() as db:
+        assert await served_by(cluster, db) == "replica-2"
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field, computed_field
 from utils.ClassLogger import LoggerConfig
@@ -34,6 +35,33 @@ class Settings(BaseSettings):
     DB_MAX_OVERFLOW: int = 20
     DB_POOL_TIMEOUT: int = 30
     DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_CACHE_SIZE: int = 64       # prepared statements на одно соединение (LRU)
+    DB_MIGRATE_ON_STARTUP: bool = True      # применять миграции app/sql/migrations при старте
+    DB_POOL_WARMUP: bool = True             # при старте открыть пул до DB_POOL_SIZE и подготовить горячие запросы
+    DB_CONNECTION_BUDGET: int = 0           # соединений с primary на все процессы app/serve.py; 0 — без ограничения
+
+    # --- Serving (app/serve.py) ---
+    WEB_HOST: str = "0.0.0.0"
+    WEB_PORT: int = 8888
+    WEB_WORKERS: int = 0                    # число процессов; 0 — по числу доступных CPU
+    WEB_GRACEFUL_SHUTDOWN: float = 10.0     # сколько ждать открытые соединения (ленты SSE) при остановке, сек
+    LEADER_POLL_INTERVAL: float = 5.0       # как часто процессы пытаются стать лидером, сек
+
+    # --- Read replicas ---
+    DB_REPLICA_URLS: list[str] = []         # JSON-список postgresql+asyncpg://... реплик; пусто — всё на primary
+    DB_REPLICA_EJECT_SECONDS: float = 30.0  # на сколько исключать реплику из ротации после ошибки, сек
+
+    # --- Admission control ---
+    DB_ADMISSION_ENABLED: bool = True
+    DB_ADMISSION_MAX_WAITERS: int = 50      # при исчерпанном пуле: максимум ожидающих соединение
+    DB_ADMISSION_MAX_WAIT: float = 2.0      # при исчерпанном пуле: максимум ожидаемого ожидания, сек
+
+    # --- Query statistics ---
+    SLOW_QUERY_THRESHOLD_MS: float = 500.0  # запросы дольше порога пишутся в slow-query лог
+    SLOW_QUERY_LOG_FILE: str = "slow_queries.log"
+    SLOW_QUERY_EXPLAIN: bool = False        # снимать EXPLAIN (ANALYZE, BUFFERS) медленных SELECT
+    SLOW_QUERY_EXPLAIN_INTERVAL: float = 300.0  # не чаще раза в N секунд на отпечаток запроса
+    ADMIN_TOKEN: str = ""                    # токен заголовка X-Admin-Token для /admin; пусто — /admin отключены
 
     @computed_field
     def ASYNC_DB_URL(self) -> str:
@@ -51,11 +79,77 @@ class Settings(BaseSettings):
     LOG_FILE: str = "app.log"
     PROJECT_ROOT: Path = Field(default_factory=lambda: Path(__file__).resolve().parent.parent)
     LOG_DIR: Path = Field(default_factory=lambda: Path(__file__).resolve().parent.parent / "logs")
+    LOG_QUEUE_ENABLED: bool = False         # писать логи через очередь в отдельном потоке
+    LOG_QUEUE_SIZE: int = 10000             # размер очереди записей
+    LOG_QUEUE_POLICY: str = "drop"          # drop | block при переполнении очереди
+    LOG_QUEUE_BLOCK_TIMEOUT: float = 1.0    # сколько ждать места в очереди при block, сек
+    LOG_SAMPLING: dict[str, int] = {}       # логгер -> N: писать 1 из N записей INFO и ниже
+    LOG_RATE_LIMIT: float = 0.0             # записей INFO и ниже в секунду на логгер, 0 — без ограничения
+    LOG_RATE_BURST: int = 50                # запас записей сверх ограничения частоты
+    LOG_SUPPRESSED_SUMMARY_INTERVAL: float = 60.0   # как часто писать сводку о подавленных записях, сек
 
 
     API_PREFIX: str = "/api/v1"
     TIMEZONE: str = "Europe/Moscow"
 
+    # --- Pagination ---
+    INCIDENTS_PAGE_DEFAULT_LIMIT: int = 100     # размер страницы по умолчанию
+    INCIDENTS_PAGE_MAX_LIMIT: int = 1000        # жёсткий предел размера страницы
+    EXPORT_CHUNK_SIZE: int = 1000               # строк за одну выборку при выгрузке
+    INCIDENTS_SEARCH_MAX_CANDIDATES: int = 5000 # поиск ранжирует столько самых новых совпадений
+
+    # --- Batch ingestion ---
+    INCIDENTS_BATCH_MAX_SIZE: int = 1000        # максимум инцидентов в одном пакете
+    INCIDENTS_BATCH_COPY_THRESHOLD: int = 200   # с какого размера пакета вставлять через COPY
+
+    # --- Write-behind ingestion ---
+    INCIDENTS_ASYNC_SOURCES: list[str] = []     # источники, инциденты которых всегда пишутся отложенно (202)
+    INCIDENTS_ASYNC_QUEUE_SIZE: int = 10000     # максимум инцидентов в очереди отложенной записи
+    INCIDENTS_ASYNC_BATCH_SIZE: int = 500       # инцидентов в одном пакете записи
+    INCIDENTS_ASYNC_FLUSH_MS: int = 50          # максимальное ожидание неполного пакета, мс
+
+    # --- Change feed ---
+    INCIDENTS_STREAM_HISTORY: int = 1000        # событий в истории для продолжения с Last-Event-ID
+    INCIDENTS_STREAM_CLIENT_BUFFER: int = 256   # событий в буфере клиента; переполнен — клиент отключается
+    INCIDENTS_STREAM_MAX_CLIENTS: int = 1000    # максимум подписчиков ленты на процесс
+    INCIDENTS_STREAM_HEARTBEAT: float = 15.0    # пауза без событий, после которой отправляется heartbeat, сек
+
+    # --- Conditional GET ---
+    HTTP_ETAG_ENABLED: bool = True              # ETag и 304 для списка инцидентов и статистики
+    HTTP_ETAG_SETTLE_SECONDS: float = 1.0       # с репликами: ETag выдаются не раньше, чем через N сек после изменения
+
+    # --- Deduplication ---
+    INCIDENTS_DEDUP_SOURCES: list[str] = []     # источники, повторы инцидентов которых схлопываются
+    INCIDENTS_DEDUP_WINDOW: float = 10.0        # сколько повторы поглощаются кэшем процесса без БД, сек
+    INCIDENTS_DEDUP_CACHE_SIZE: int = 10000     # максимум отпечатков в кэше процесса
+    INCIDENTS_DEDUP_FLUSH_INTERVAL: float = 1.0 # как часто записывать повторы из кэша в БД, сек
+
+    # --- Partitioning and retention ---
+    INCIDENTS_PARTITIONS_AHEAD: int = 3         # на сколько месяцев вперёд создавать секции
+    INCIDENTS_MAINTENANCE_INTERVAL: float = 3600.0  # как часто запускать обслуживание incidents, сек
+    INCIDENTS_RETENTION_MODE: Literal["off", "archive", "detach"] = "off"   # что делать со старыми инцидентами
+    INCIDENTS_RETENTION_DAYS: int = 365         # срок хранения инцидентов в incidents, дней
+    INCIDENTS_RETENTION_BATCH_SIZE: int = 1000  # строк за одну пачку переноса в архив
+    INCIDENTS_RETENTION_BATCH_PAUSE: float = 0.5    # пауза между пачками (и отсоединениями секций), сек
+
+    # --- Incident cache ---
+    INCIDENTS_CACHE_SIZE: int = 10000           # инцидентов в кэше GET /incidents/{id}
+    INCIDENTS_CACHE_TTL: float = 30.0           # время жизни записи кэша инцидента, сек
+
+    # --- Monitoring ---
+    MONITORING_CACHE_TTL: float = 2.0           # время жизни кэша статистики, сек
+
+    # --- Rollups ---
+    ROLLUP_INTERVAL: float = 60.0               # как часто пересчитывать агрегаты инцидентов, сек
+    ROLLUP_BATCH_SIZE: int = 500                # часов за одну пачку пересчёта
+    ROLLUP_HOURLY_RETENTION_DAYS: int = 30      # часовые агрегаты старше сворачиваются в дневные
+    INCIDENTS_TIMESERIES_MAX_BUCKETS: int = 2000    # максимум корзин в одном запросе временного ряда
+
+    # --- Health checks ---
+    HEALTH_PROBE_INTERVAL: float = 5.0          # как часто фоновая задача проверяет БД, сек
+    HEALTH_PROBE_TIMEOUT: float = 2.0           # таймаут одной проверки, сек
+    HEALTH_PROBE_STALE_AFTER: float = 15.0      # результат старше — readiness не пройдена, сек
+
 
     def create_dirs(self):
         """Создание директорий после инициализации"""
@@ -84,6 +178,14 @@ logger_config = LoggerConfig(
     log_level=settings.LOG_LEVEL,
     console_output=True,
     use_json=False,
+    use_queue=settings.LOG_QUEUE_ENABLED,
+    queue_size=settings.LOG_QUEUE_SIZE,
+    queue_policy=settings.LOG_QUEUE_POLICY,
+    queue_block_timeout=settings.LOG_QUEUE_BLOCK_TIMEOUT,
+    sampling=settings.LOG_SAMPLING,
+    rate_limit=settings.LOG_RATE_LIMIT,
+    rate_burst=settings.LOG_RATE_BURST,
+    suppressed_summary_interval=settings.LOG_SUPPRESSED_SUMMARY_INTERVAL,
 )
 
 
@@ -0,0 +1,75 @@
+from typing import Callable
+import hashlib
+import time
+import uuid
+
+from utils.ClassMetrics import metrics
+
+
+conditional_requests = metrics.counter(
+    "http_conditional_requests_total", "Условные GET-запросы (If-None-Match) по результату", ["route", "result"]
+)
+
+
+class DataVersion:
+    """
+    Версия данных для сильных ETag, общая для всех процессов.
+    shared() — версия из БД (см. IncidentEventHub.version) или None, если она неизвестна.
+    ETag = общая версия + хэш параметров запроса: процессы и их перезапуски выдают одинаковые ETag
+    для одних и тех же данных.
+    bump(seen) — запись через этот процесс зафиксирована (seen — общая версия до начала записи): пока
+    уведомление о записи не изменило общую версию, к ней добавляется метка процесса (случайная эпоха
+    + счётчик записей), и такой ETag не совпадёт с ETag других процессов.
+    changed() — общая версия изменилась (событие из БД).
+    etag() возвращает None (ETag не выдаётся), пока enabled() ложно или общей версии нет,
+    и settle секунд после изменения (реплики для чтения могут отставать).
+    """
+
+    def __init__(
+        self,
+        settle: float = 0.0,
+        enabled: Callable[[], bool] = lambda: True,
+        shared: Callable[[], str | None] = lambda: None,
+    ):
+        self.settle = settle
+        self.enabled = enabled
+        self.shared = shared
+        self.epoch = uuid.uuid4().hex[:12]
+        self.version = 0
+        # общая версия на момент последней записи процесса, пока уведомление о записи не пришло
+        self.pending: str | None = None
+        self.changed_at = float("-inf")
+
+    def bump(self, seen: str | None) -> None:
+        self.version += 1
+        # если общая версия уже изменилась, уведомление о записи (или более позднее) получено и метка не нужна
+        self.pending = seen if seen is not None and seen == self.shared() else None
+        self.changed_at = time.monotonic()
+
+    def changed(self) -> None:
+        self.changed_at = time.monotonic()
+
+    def etag(self, *parts) -> str | None:
+        """Сильный ETag для текущей версии и параметров запроса или None"""
+        shared = self.shared()
+        if not self.enabled() or shared is None or time.monotonic() - self.changed_at < self.settle:
+            return None
+        version = shared
+        if self.pending is not None:
+            if self.pending == shared:
+                version = f"{shared}.{self.epoch}-{self.version}"
+            else:
+                self.pending = None
+        digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+        return f'"{version}-{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Совпадает ли ETag с заголовком If-None-Match (список тегов или *; сравнение слабое, RFC 9110)"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
@@ -1,8 +1,8 @@
 import logging
 import asyncio
 import socket
+import sys
 from json import JSONDecodeError
-import aiohttp
 
 from fastapi import Request
 from fastapi.responses import JSONResponse
@@ -37,15 +37,18 @@ class ErrorHandler:
 
     async def handle_client_error(self, e: Exception, context: str = "") -> ErrorInfo:
         """Обработка ошибок при работе с внешними клиентами"""
+        # aiohttp не импортируется ради isinstance (долгий импорт при старте):
+        # его исключения возможны, только если модуль уже загружен вызывающим кодом
+        aiohttp = sys.modules.get("aiohttp")
         if isinstance(e, asyncio.TimeoutError):
             info = ErrorInfo("Сервер не ответил вовремя", "TimeoutError", "warning", context)
-        elif isinstance(e, aiohttp.ClientConnectorError):
+        elif aiohttp is not None and isinstance(e, aiohttp.ClientConnectorError):
             info = ErrorInfo("Ошибка подключения к серверу", "ClientConnectorError", "error", context)
-        elif isinstance(e, aiohttp.ClientResponseError):
+        elif aiohttp is not None and isinstance(e, aiohttp.ClientResponseError):
             info = ErrorInfo(f"Ошибка HTTP-ответа: {e.status} {e.message}", "ClientResponseError", "error", context)
-        elif isinstance(e, aiohttp.ClientPayloadError):
+        elif aiohttp is not None and isinstance(e, aiohttp.ClientPayloadError):
             info = ErrorInfo("Ошибка чтения тела ответа", "ClientPayloadError", "error", context)
-        elif isinstance(e, aiohttp.ClientError):
+        elif aiohttp is not None and isinstance(e, aiohttp.ClientError):
             info = ErrorInfo(f"Ошибка клиента aiohttp: {e}", "ClientError", "error", context)
         elif isinstance(e, JSONDecodeError):
             info = ErrorInfo("Ошибка декодирования JSON", "JSONDecodeError", "error", context)
@@ -68,18 +71,20 @@ class ErrorHandler:
     async def handle_http_exception(self, request: Request, exc: Exception) -> JSONResponse:
         """Обработка всех HTTP и пользовательских ошибок"""
         status_code = 500
+        headers = None
         if isinstance(exc, AppException):
             info = ErrorInfo(exc.message, exc.__class__.__name__, "warning", str(request.url))
             status_code = exc.status_code
+            headers = exc.headers
             if exc.original_exc:
-                self.logger.exception(f"[{request.url}] {exc.message}", exc_info=exc.original_exc)
+                self.logger.exception("[%s] %s", request.url, exc.message, exc_info=exc.original_exc)
             else:
-                self.logger.warning(f"[{request.url}] {exc.message}")
+                self.logger.warning("[%s] %s", request.url, exc.message)
 
         elif isinstance(exc, StarletteHTTPException):
             info = ErrorInfo(str(exc.detail), "HTTPException", "warning", str(request.url))
             status_code = exc.status_code
-            self.logger.warning(f"[{request.url}] {exc.detail}")
+            self.logger.warning("[%s] %s", request.url, exc.detail)
 
         elif isinstance(exc, RequestValidationError):
             errors = []
@@ -89,7 +94,7 @@ class ErrorHandler:
                 errors.append({"field": loc, "message": msg})
             info = ErrorInfo(errors, "ValidationError", "warning", str(request.url))
             status_code = 422
-            self.logger.warning(f"[{request.url}] ValidationError: {errors}")
+            self.logger.warning("[%s] ValidationError: %s", request.url, errors)
 
         elif isinstance(exc, ResponseValidationError):
             errors = []
@@ -99,11 +104,11 @@ class ErrorHandler:
                 errors.append({"field": loc, "message": msg})
             info = ErrorInfo(errors, "ResponseValidationError", "warning", str(request.url))
             status_code = 500
-            self.logger.warning(f"[{request.url}] ResponseValidationError: {errors}")
+            self.logger.warning("[%s] ResponseValidationError: %s", request.url, errors)
 
         else:
             info = ErrorInfo("Внутренняя ошибка сервера", "InternalServerError", "error", str(request.url))
             status_code = 500
-            self.logger.exception(f"[{request.url}] UnexpectedError: {exc}")
+            self.logger.exception("[%s] UnexpectedError: %s", request.url, exc)
 
-        return JSONResponse(status_code=status_code, content=info.to_dict())
+        return JSONResponse(status_code=status_code, content=info.to_dict(), headers=headers)
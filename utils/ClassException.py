@@ -1,12 +1,20 @@
 
 class AppException(Exception):
     """Базовое исключение приложения с HTTP статусом"""
-    def __init__(self, message: str, status_code: int = 400, field: str | None = None, original_exc: Exception | None = None):
+    def __init__(
+        self,
+        message: str,
+        status_code: int = 400,
+        field: str | None = None,
+        original_exc: Exception | None = None,
+        headers: dict[str, str] | None = None,
+    ):
         super().__init__(message)
         self.message = message
         self.status_code = status_code
         self.field = field
         self.original_exc = original_exc
+        self.headers = headers      # дополнительные заголовки ответа (например, Retry-After)
 
     def __str__(self):
         if self.original_exc:
@@ -37,3 +45,8 @@ class ConflictData(AppException):
 class InternalServerError(AppException):
     def __init__(self, message="Внутренняя ошибка сервера", field=None):
         super().__init__(message, 500, field)
+
+
+class ServiceUnavailable(AppException):
+    def __init__(self, message="Сервис временно перегружен, повторите запрос позже", retry_after: int = 1, field=None):
+        super().__init__(message, 503, field, headers={"Retry-After": str(retry_after)})
@@ -0,0 +1,122 @@
+from typing import Awaitable, Callable
+import asyncio
+import logging
+import time
+
+from utils.ClassMetrics import metrics
+
+
+probe_ok = metrics.gauge("health_probe_ok", "Результат последней проверки зависимости (1 — успешно)", ["check"])
+probe_latency = metrics.gauge("health_probe_latency_seconds", "Длительность последней проверки зависимости, сек", ["check"])
+
+
+class ProbeResult:
+    """Результат последней проверки одной зависимости"""
+    __slots__ = ("ok", "latency", "checked_at", "error")
+
+    def __init__(self, ok: bool, latency: float, checked_at: float, error: str | None = None):
+        self.ok = ok
+        self.latency = latency          # длительность проверки, сек
+        self.checked_at = checked_at    # time.monotonic() окончания проверки
+        self.error = error
+
+
+class HealthProber:
+    """
+    Фоновая проверка зависимостей (БД и т.п.) раз в interval секунд с кэшированием результата.
+    Эндпоинты здоровья отвечают из памяти и не занимают соединения пула.
+    Готовность (ready) требует, чтобы все критичные проверки были успешными и не старше stale_after секунд,
+    а с warmup=True — ещё и завершённого прогрева процесса (warmed()).
+    """
+
+    def __init__(
+        self,
+        checks: dict[str, Callable[[], Awaitable]],
+        interval: float = 5.0,
+        timeout: float = 2.0,
+        stale_after: float = 15.0,
+        critical: set[str] | None = None,
+        warmup: bool = False,
+        logger: logging.Logger | None = None,
+    ):
+        self.checks = checks
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.critical = set(checks) if critical is None else critical
+        self.logger = logger or logging.getLogger(__name__)
+        self.results: dict[str, ProbeResult] = {}
+        self.warm = not warmup
+        self._task: asyncio.Task | None = None
+
+    async def _check(self, name: str, check: Callable[[], Awaitable]) -> None:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(check(), self.timeout)
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        latency = time.perf_counter() - start
+
+        previous = self.results.get(name)
+        self.results[name] = ProbeResult(error is None, latency, time.monotonic(), error)
+        probe_ok.set(int(error is None), check=name)
+        probe_latency.set(latency, check=name)
+
+        # в лог пишутся только смены состояния, а не каждая проверка
+        if error is not None and (previous is None or previous.ok):
+            self.logger.warning("❌ Проверка %s не прошла: %s", name, error)
+        elif error is None and previous is not None and not previous.ok:
+            self.logger.info("✅ Проверка %s снова успешна", name)
+
+    async def probe_once(self) -> None:
+        """Выполняет все проверки параллельно и обновляет кэш"""
+        await asyncio.gather(*(self._check(name, check) for name, check in self.checks.items()))
+
+    async def _run(self) -> None:
+        while True:
+            await self.probe_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Запускает фоновые проверки в текущем event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def warmed(self) -> None:
+        """Прогрев завершён: с этого момента готовность определяется только проверками"""
+        self.warm = True
+
+    def ready(self) -> bool:
+        """Процесс прогрет, все критичные проверки выполнялись недавно и успешно"""
+        if not self.warm:
+            return False
+        now = time.monotonic()
+        for name in self.critical:
+            result = self.results.get(name)
+            if result is None or not result.ok or now - result.checked_at > self.stale_after:
+                return False
+        return True
+
+    def snapshot(self) -> dict:
+        """Кэшированные результаты проверок для ответа эндпоинта"""
+        now = time.monotonic()
+        return {
+            name: {
+                "ok": result.ok,
+                "latency_ms": round(result.latency * 1000, 3),
+                "age_seconds": round(now - result.checked_at, 3),
+                "stale": now - result.checked_at > self.stale_after,
+                "error": result.error,
+            }
+            for name, result in self.results.items()
+        }
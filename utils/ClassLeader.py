@@ -0,0 +1,105 @@
+from typing import Awaitable, Callable
+import asyncio
+import logging
+
+import asyncpg
+
+from utils.ClassMetrics import metrics
+
+
+leader_gauge = metrics.gauge("leader", "Процесс — лидер (выполняет singleton-задачи)")
+
+
+class LeaderElection:
+    """
+    Выбор лидера среди процессов сервиса через сессионный advisory lock PostgreSQL.
+    Лок держится на отдельном соединении, пока процесс жив: при падении лидера PostgreSQL
+    освобождает лок вместе с соединением, и следующий процесс забирает его в течение interval секунд.
+    try_acquire только берёт лок (например, для разовой работы при старте); фоновая задача start
+    вызывает on_elected, когда процесс лидер, и on_lost — при потере лидерства и остановке.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        lock_id: int,
+        on_elected: Callable[[], Awaitable] | None = None,
+        on_lost: Callable[[], Awaitable] | None = None,
+        interval: float = 5.0,
+        logger: logging.Logger | None = None,
+    ):
+        self.dsn = dsn
+        self.lock_id = lock_id
+        self.on_elected = on_elected
+        self.on_lost = on_lost
+        self.interval = interval
+        self.logger = logger or logging.getLogger(__name__)
+        self.is_leader = False
+        self._active = False        # on_elected вызван, on_lost ещё нет
+        self._connection: asyncpg.Connection | None = None
+        self._task: asyncio.Task | None = None
+        leader_gauge.set_function(lambda: int(self.is_leader))
+
+    async def try_acquire(self) -> bool:
+        """Одна попытка стать лидером; True — процесс лидер"""
+        if self.is_leader:
+            return True
+        if self._connection is None or self._connection.is_closed():
+            self._connection = await asyncpg.connect(self.dsn)
+        if not await self._connection.fetchval("SELECT pg_try_advisory_lock($1)", self.lock_id):
+            return False
+
+        self.is_leader = True
+        self.logger.info("Процесс стал лидером (advisory lock %s)", self.lock_id)
+        return True
+
+    async def _check(self) -> None:
+        """Лидер проверяет, что соединение с локом живо"""
+        try:
+            await self._connection.execute("SELECT 1", timeout=self.interval)
+        except Exception as e:
+            self.logger.warning("Соединение лидера потеряно: %s", e)
+            await self._release()
+
+    async def _release(self) -> None:
+        was_active, self.is_leader, self._active = self._active, False, False
+        if self._connection is not None:
+            # закрытие соединения освобождает advisory lock
+            self._connection.terminate()
+            self._connection = None
+        if was_active and self.on_lost is not None:
+            await self.on_lost()
+
+    async def _step(self) -> None:
+        if self._active:
+            await self._check()
+        elif await self.try_acquire():
+            self._active = True
+            if self.on_elected is not None:
+                await self.on_elected()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._step()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning("Ошибка выбора лидера: %s", e)
+                await self._release()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="leader_election")
+
+    async def stop(self) -> None:
+        """Снимает лидерство (другой процесс заберёт его без ожидания сбоя)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._release()
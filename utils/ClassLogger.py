@@ -1,9 +1,14 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from datetime import datetime
 import logging
 from pathlib import Path
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
+import atexit
 import json
+import queue
 import threading
+import time
 
 
 class JsonFormatter(logging.Formatter):
@@ -46,6 +51,145 @@ class SmartTimedRotatingFileHandler(TimedRotatingFileHandler):
         date_str = datetime.now().strftime(self.suffix)
         return f"{self.baseFilenameNoExt}.{date_str}{self.ext}"
 
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler с ограниченной очередью.
+    При переполнении: policy="drop" — запись отбрасывается, policy="block" — ждём место
+    не дольше block_timeout секунд (None — без ограничения), затем отбрасываем.
+    """
+    def __init__(self, log_queue: queue.Queue, policy: str = "drop", block_timeout: float | None = 1.0):
+        super().__init__(log_queue)
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Неизвестная политика очереди логов: {policy}")
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.policy == "block":
+                self.queue.put(record, block=True, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class _PolicyFilter(logging.Filter, ABC):
+    """
+    Базовый фильтр политики логирования.
+    Решение по записи запоминается в самой записи, поэтому один экземпляр фильтра
+    можно повесить на несколько обработчиков (файл и консоль) без двойного счёта.
+    Записи уровня выше max_level (по умолчанию WARNING и выше) не ограничиваются.
+    """
+    def __init__(self, max_level: int = logging.INFO):
+        super().__init__()
+        self.max_level = max_level
+        self._attr = f"_policy_{id(self)}"
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        decision = getattr(record, self._attr, None)
+        if decision is None:
+            decision = self.allow(record)
+            setattr(record, self._attr, decision)
+        return decision
+
+    @abstractmethod
+    def allow(self, record: logging.LogRecord) -> bool:
+        """Пропустить ли запись (вызывается один раз на запись)"""
+
+
+class SamplingFilter(_PolicyFilter):
+    """
+    Сэмплирование массовых сообщений: для логгера из rates (с учётом дочерних логгеров)
+    пропускается 1 запись из N для каждого шаблона сообщения (record.msg до подстановки аргументов).
+    Счётчики хранятся для max_keys последних шаблонов (LRU): сообщения, собранные f-строками,
+    дают новый шаблон на каждую запись и не раздувают память.
+    Пример rates: {"app.api": 10, "app.crud": 100}
+    """
+    def __init__(self, rates: dict[str, int], max_level: int = logging.INFO, max_keys: int = 10000):
+        super().__init__(max_level)
+        self.rates = dict(rates)
+        self.max_keys = max_keys
+        self._rate_cache: dict[str, int] = {}
+        self._seen: OrderedDict[tuple[str, str], int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _rate(self, name: str) -> int:
+        rate = self._rate_cache.get(name)
+        if rate is None:
+            rate = 1
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._rate_cache[name] = rate
+        return rate
+
+    def allow(self, record: logging.LogRecord) -> bool:
+        rate = self._rate(record.name)
+        if rate <= 1:
+            return True
+        key = (record.name, str(record.msg))
+        with self._lock:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+            self._seen.move_to_end(key)
+            if len(self._seen) > self.max_keys:
+                self._seen.popitem(last=False)
+        return seen % rate == 0
+
+
+class RateLimitFilter(_PolicyFilter):
+    """
+    Ограничение частоты записей на логгер (token bucket): rate записей в секунду, запас burst.
+    Не чаще раза в summary_interval секунд логгер пишет сводку «подавлено N сообщений».
+    """
+    def __init__(self, rate: float, burst: int = 50, summary_interval: float = 60.0, max_level: int = logging.INFO):
+        super().__init__(max_level)
+        self.rate = rate
+        self.burst = burst
+        self.summary_interval = summary_interval
+        self._buckets: dict[str, list[float]] = {}     # логгер -> [токены, время пополнения]
+        self._suppressed: dict[str, int] = {}
+        self._last_summary: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, record: logging.LogRecord) -> bool:
+        now = time.monotonic()
+        name = record.name
+        with self._lock:
+            bucket = self._buckets.get(name)
+            if bucket is None:
+                bucket = self._buckets[name] = [float(self.burst), now]
+                self._last_summary[name] = now
+            bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            allowed = bucket[0] >= 1.0
+            if allowed:
+                bucket[0] -= 1.0
+            else:
+                self._suppressed[name] = self._suppressed.get(name, 0) + 1
+
+            suppressed = 0
+            if self._suppressed.get(name) and now - self._last_summary[name] >= self.summary_interval:
+                suppressed = self._suppressed.pop(name)
+                self._last_summary[name] = now
+
+        if suppressed:
+            # уровень WARNING не ограничивается фильтром, поэтому сводка не подавит сама себя
+            logging.getLogger(name).warning(
+                "Подавлено %s сообщений логгера %s (ограничение %s/сек)", suppressed, name, self.rate
+            )
+        return allowed
+
+
 class LoggerConfig:
     """Универсальный класс для настройки логирования"""
     _lock = threading.Lock()  # защита от гонок при многопоточном вызове
@@ -61,7 +205,15 @@ class LoggerConfig:
         backup_count: int = 30,
         encoding: str = "utf-8",
         console_output: bool = True,
-        use_json: bool = False
+        use_json: bool = False,
+        use_queue: bool = False,
+        queue_size: int = 10000,
+        queue_policy: str = "drop",
+        queue_block_timeout: float | None = 1.0,
+        sampling: dict[str, int] | None = None,
+        rate_limit: float = 0.0,
+        rate_burst: int = 50,
+        suppressed_summary_interval: float = 60.0,
     ):
         self.base_dir = Path(base_dir) if base_dir else Path(__file__).resolve().parent
         self.log_dir = self._resolve_log_dir(log_dir)
@@ -74,6 +226,18 @@ class LoggerConfig:
         self.encoding = encoding
         self.console_output = console_output    # флаг для вывода в консоль
         self.use_json = use_json                # флаг для json логов
+        self.use_queue = use_queue              # запись логов через очередь в отдельном потоке
+        self.queue_size = queue_size
+        self.queue_policy = queue_policy        # drop | block при переполнении очереди
+        self.queue_block_timeout = queue_block_timeout
+        self.sampling = sampling or {}          # логгер -> N (пропускать 1 из N записей INFO и ниже)
+        self.rate_limit = rate_limit            # записей в секунду на логгер, 0 — без ограничения
+        self.rate_burst = rate_burst
+        self.suppressed_summary_interval = suppressed_summary_interval
+        self._queue_handler: BoundedQueueHandler | None = None
+        self._listener: QueueListener | None = None
+        # отдельные файловые логгеры (get_file_logger) с очередью: логгер -> (обработчик очереди, поток)
+        self._file_queues: dict[logging.Logger, tuple[BoundedQueueHandler, QueueListener]] = {}
         self.app_logger_name = self.log_file.replace(".log", "")    # имя для файла с логами
         try:
             self.log_dir.mkdir(parents=True, exist_ok=True)
@@ -113,10 +277,67 @@ class LoggerConfig:
                 console_handler = logging.StreamHandler()
                 console_handler.setFormatter(formatter)
                 handlers.append(console_handler)
+            if self.use_queue:
+                # Файл и консоль пишет поток QueueListener, event loop только кладёт запись в очередь
+                self._queue_handler, self._listener = self._start_queue(handlers)
+                handlers = [self._queue_handler]
+            policy_filters = self._policy_filters()
             for h in handlers:
+                for policy_filter in policy_filters:
+                    h.addFilter(policy_filter)
                 root.addHandler(h)
             root.setLevel(getattr(logging, self.log_level, logging.INFO))
-            logging.info(f"Логирование инициализировано. Запущен файл: {self.app_logger_name} Лог: {log_path}")
+            logging.info("Логирование инициализировано. Запущен файл: %s Лог: %s", self.app_logger_name, log_path)
+
+    def _start_queue(self, handlers: list[logging.Handler]) -> tuple[BoundedQueueHandler, QueueListener]:
+        """Обработчик очереди и поток QueueListener, который пишет из неё в handlers"""
+        queue_handler = BoundedQueueHandler(
+            queue.Queue(maxsize=self.queue_size),
+            policy=self.queue_policy,
+            block_timeout=self.queue_block_timeout,
+        )
+        listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        listener.start()
+        if self._listener is None and not self._file_queues:
+            atexit.register(self.shutdown)
+        return queue_handler, listener
+
+    def _policy_filters(self) -> list[logging.Filter]:
+        """Фильтры политики логирования: сэмплирование и ограничение частоты"""
+        policy_filters: list[logging.Filter] = []
+        if self.sampling:
+            policy_filters.append(SamplingFilter(self.sampling))
+        if self.rate_limit > 0:
+            policy_filters.append(
+                RateLimitFilter(self.rate_limit, self.rate_burst, self.suppressed_summary_interval)
+            )
+        return policy_filters
+
+    @property
+    def dropped_records(self) -> int:
+        """Сколько записей отброшено из-за переполнения очереди логов"""
+        dropped = self._queue_handler.dropped if self._queue_handler else 0
+        return dropped + sum(handler.dropped for handler, _ in self._file_queues.values())
+
+    def shutdown(self) -> None:
+        """Дописывает записи из очередей и останавливает потоки QueueListener"""
+        with self._lock:
+            if self._listener is None and not self._file_queues:
+                return
+            if self.dropped_records:
+                logging.warning("Отброшено записей лога из-за переполнения очереди: %s", self.dropped_records)
+            queues = [(logger, queue_handler, listener)
+                      for logger, (queue_handler, listener) in self._file_queues.items()]
+            if self._listener is not None:
+                queues.append((logging.getLogger(), self._queue_handler, self._listener))
+            for logger, queue_handler, listener in queues:
+                listener.stop()     # обрабатывает всё, что осталось в очереди
+                logger.removeHandler(queue_handler)
+                for handler in listener.handlers:
+                    handler.flush()
+                    logger.addHandler(handler)  # записи при завершении процесса пишем напрямую
+            self._file_queues.clear()
+            self._listener = None
 
     def get_logger(self, name: str | None = None) -> logging.Logger:
         """Именованный логгер (по умолчанию __name__)"""
@@ -124,11 +345,36 @@ class LoggerConfig:
         #logger.propagate = False  # избегаем дублирования в root
         return logger
 
+    def get_file_logger(self, name: str, log_file: str) -> logging.Logger:
+        """
+        Отдельный логгер со своим файлом (с ротацией) в директории логов.
+        Записи не уходят в общий лог (propagate = False). С use_queue файл пишет свой поток QueueListener.
+        """
+        logger = logging.getLogger(name)
+        with self._lock:
+            if not logger.handlers:
+                formatter = JsonFormatter() if self.use_json else logging.Formatter(self.log_format)
+                handler = SmartTimedRotatingFileHandler(
+                    filename=str(self.log_dir / log_file),
+                    when=self.when,
+                    interval=self.interval,
+                    backupCount=self.backup_count,
+                    encoding=self.encoding
+                )
+                handler.setFormatter(formatter)
+                if self.use_queue:
+                    queue_handler, listener = self._start_queue([handler])
+                    self._file_queues[logger] = (queue_handler, listener)
+                    handler = queue_handler
+                logger.addHandler(handler)
+                logger.propagate = False
+        return logger
+
     def update_level(self, new_level: str) -> None:
         """Динамическое изменение уровня логирования"""
         self.log_level = new_level.upper()
         logging.getLogger().setLevel(getattr(logging, self.log_level, logging.INFO))
-        logging.info(f"Уровень логирования изменен на: {self.log_level}")
+        logging.info("Уровень логирования изменен на: %s", self.log_level)
 
     def get_log_path(self) -> Path:
         'путь '
@@ -136,7 +382,7 @@ class LoggerConfig:
 
     def __repr__(self) -> str:
         return (f"LoggerConfig(log_dir={self.log_dir}, log_file={self.log_file}, "
-                f"level={self.log_level}, console={self.console_output}, use_json={self.use_json})")
+                f"level={self.log_level}, console={self.console_output}, use_json={self.use_json}, use_queue={self.use_queue})")
 
 
 
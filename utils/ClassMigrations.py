@@ -0,0 +1,240 @@
+from pathlib import Path
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+
+
+# Ключ advisory lock миграций (общий для всех процессов сервиса)
+MIGRATIONS_LOCK_ID = 7_301_015
+
+# Файл миграции: 0001_initial.sql -> версия "0001", имя "initial"
+_MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+# Директива в начале файла: выполнять операторы по одному вне транзакции
+# (нужно для CREATE INDEX CONCURRENTLY, который нельзя выполнить в транзакции)
+NO_TRANSACTION = "-- migrate:no-transaction"
+
+# Конец оператора: ";" в конце строки (для миграций без транзакции, без тел функций)
+_STATEMENT_END = re.compile(r";\s*$", re.M)
+_COMMENT_LINE = re.compile(r"^\s*--[^\n]*$", re.M)
+
+
+class Migration:
+    """Файл миграции с версией, именем и контрольной суммой"""
+    __slots__ = ("version", "name", "path", "sql", "checksum", "transactional")
+
+    def __init__(self, version: str, name: str, path: Path):
+        self.version = version
+        self.name = name
+        self.path = path
+        self.sql = path.read_text(encoding="utf-8")
+        self.checksum = hashlib.sha256(self.sql.encode()).hexdigest()
+        self.transactional = not self.sql.lstrip().startswith(NO_TRANSACTION)
+
+    def statements(self) -> list[str]:
+        """Операторы миграции по отдельности (для выполнения вне транзакции)"""
+        parts = (_COMMENT_LINE.sub("", part).strip() for part in _STATEMENT_END.split(self.sql))
+        return [part for part in parts if part]
+
+
+class MigrationRunner:
+    """
+    Версионные миграции из SQL-файлов NNNN_name.sql.
+    Применённые версии хранятся в таблице schema_migrations; применяются только новые, по порядку.
+    На время миграции берётся advisory lock, поэтому при нескольких процессах мигрирует один,
+    а остальные ждут его и затем видят, что применять нечего.
+    Обычная миграция выполняется в транзакции вместе с записью версии; миграция с директивой
+    "-- migrate:no-transaction" выполняется по оператору и должна быть идемпотентной (IF NOT EXISTS).
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        directory: Path,
+        lock_id: int = MIGRATIONS_LOCK_ID,
+        poll_interval: float = 0.5,
+        logger: logging.Logger | None = None,
+    ):
+        self.engine = engine
+        self.directory = Path(directory)
+        self.lock_id = lock_id
+        self.poll_interval = poll_interval
+        self.logger = logger or logging.getLogger(__name__)
+
+    def discover(self) -> list[Migration]:
+        """Файлы миграций, отсортированные по версии"""
+        migrations = []
+        for path in self.directory.glob("*.sql"):
+            match = _MIGRATION_FILE.match(path.name)
+            if match:
+                migrations.append(Migration(match.group(1), match.group(2), path))
+        migrations.sort(key=lambda migration: int(migration.version))
+        versions = [migration.version for migration in migrations]
+        if len(versions) != len(set(versions)):
+            raise RuntimeError(f"Повторяющиеся версии миграций в {self.directory}")
+        return migrations
+
+    @staticmethod
+    async def _ensure_table(driver) -> None:
+        await driver.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version VARCHAR(32) PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                checksum CHAR(64) NOT NULL,
+                duration_ms DOUBLE PRECISION NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        """)
+
+    @staticmethod
+    async def _applied(driver) -> dict[str, str]:
+        rows = await driver.fetch("SELECT version, checksum FROM schema_migrations")
+        return {row["version"]: row["checksum"] for row in rows}
+
+    async def _lock(self, driver) -> None:
+        """
+        Ждёт advisory lock опросом pg_try_advisory_lock: процесс, заблокированный в pg_advisory_lock,
+        держит открытую транзакцию, и CREATE INDEX CONCURRENTLY у мигрирующего процесса ждал бы его.
+        """
+        waited = False
+        while not await driver.fetchval("SELECT pg_try_advisory_lock($1)", self.lock_id):
+            if not waited:
+                self.logger.info("Миграции выполняет другой процесс, ожидание...")
+                waited = True
+            await asyncio.sleep(self.poll_interval)
+
+    async def _apply(self, driver, migration: Migration) -> None:
+        start = time.perf_counter()
+        if migration.transactional:
+            async with driver.transaction():
+                await driver.execute(migration.sql)
+                await self._record(driver, migration, start)
+        else:
+            for statement in migration.statements():
+                await driver.execute(statement)
+            await self._record(driver, migration, start)
+
+    @staticmethod
+    async def _record(driver, migration: Migration, start: float) -> None:
+        await driver.execute(
+            "INSERT INTO schema_migrations (version, name, checksum, duration_ms) VALUES ($1, $2, $3, $4)",
+            migration.version, migration.name, migration.checksum, (time.perf_counter() - start) * 1000,
+        )
+
+    async def migrate(self) -> list[str]:
+        """Применяет новые миграции; возвращает их версии"""
+        migrations = self.discover()
+        applied_now = []
+
+        # Отдельное соединение вне транзакции SQLAlchemy: advisory lock уровня сессии
+        # и CREATE INDEX CONCURRENTLY требуют autocommit
+        async with self.engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            await self._lock(driver)
+            try:
+                await self._ensure_table(driver)
+                applied = await self._applied(driver)
+
+                for migration in migrations:
+                    if migration.version in applied:
+                        if applied[migration.version] != migration.checksum:
+                            self.logger.warning(
+                                "Миграция %s_%s изменена после применения", migration.version, migration.name
+                            )
+                        continue
+                    self.logger.info("Применение миграции %s_%s", migration.version, migration.name)
+                    await self._apply(driver, migration)
+                    applied_now.append(migration.version)
+            finally:
+                await driver.execute("SELECT pg_advisory_unlock($1)", self.lock_id)
+
+        if applied_now:
+            self.logger.info("✅ Применены миграции: %s", ", ".join(applied_now))
+        else:
+            self.logger.info("Схема БД актуальна, новых миграций нет")
+        return applied_now
+
+    async def pending(self) -> list[str]:
+        """Версии, ещё не применённые в БД (только чтение: без создания таблицы и блокировок)"""
+        async with self.engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            if await driver.fetchval("SELECT to_regclass('schema_migrations')") is None:
+                applied = {}
+            else:
+                applied = await self._applied(driver)
+        return [migration.version for migration in self.discover() if migration.version not in applied]
+
+    async def wait(self, timeout: float = 600.0) -> None:
+        """Ждёт, пока миграции применит другой процесс (лидер); по истечении timeout — RuntimeError"""
+        deadline = time.monotonic() + timeout
+        waited = False
+        while pending := await self.pending():
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Миграции не применены за {timeout} сек: {', '.join(pending)}")
+            if not waited:
+                self.logger.info("Ожидание миграций от другого процесса: %s", ", ".join(pending))
+                waited = True
+            await asyncio.sleep(self.poll_interval)
+
+    async def status(self) -> list[dict]:
+        """Список миграций с признаком применения"""
+        async with self.engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            await self._ensure_table(driver)
+            applied = await self._applied(driver)
+        return [
+            {
+                "version": migration.version,
+                "name": migration.name,
+                "applied": migration.version in applied,
+                "modified": migration.version in applied and applied[migration.version] != migration.checksum,
+            }
+            for migration in self.discover()
+        ]
+
+
+def _seq_scans(plan: dict, tables: tuple[str, ...]) -> list[str]:
+    """Таблицы из tables, которые читаются последовательным сканированием в узлах плана"""
+    found = []
+    relation = plan.get("Relation Name", "")
+    if plan.get("Node Type") == "Seq Scan" and relation.startswith(tables):
+        found.append(relation)
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child, tables))
+    return found
+
+
+async def check_index_scans(
+    engine: AsyncEngine,
+    queries: dict[str, tuple[str, dict]],
+    tables: tuple[str, ...],
+) -> dict[str, list[str]]:
+    """
+    Проверяет, что запросы {имя: (SQL, параметры)} могут читать таблицы tables по индексу.
+    План строится с enable_seqscan = off: на маленьких тестовых таблицах планировщик и так выбрал бы
+    последовательное сканирование, а при отключённом Seq Scan он останется только там,
+    где подходящего индекса нет. Запросы не выполняются (EXPLAIN без ANALYZE).
+    Возвращает {имя запроса: таблицы с Seq Scan} только для запросов с проблемами.
+    """
+    problems = {}
+    async with engine.connect() as conn:
+        for name, (query, params) in queries.items():
+            async with conn.begin() as transaction:
+                await conn.execute(text("SET LOCAL enable_seqscan = off"))
+                result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {query}"), params)
+                plan = result.scalar()
+                await transaction.rollback()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            seq_scans = _seq_scans(plan[0]["Plan"], tables)
+            if seq_scans:
+                problems[name] = seq_scans
+    return problems
@@ -0,0 +1,102 @@
+from collections import deque
+from functools import lru_cache
+import re
+import threading
+
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_PARAMS = re.compile(r"(?<![:\w]):[A-Za-z_]\w*|\$\d+")
+_NUMBERS = re.compile(r"(?<![\w.])[-+]?\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES = re.compile(r"(values\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+", re.I)
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(query: str) -> str:
+    """
+    Нормализованный отпечаток запроса: без комментариев, литералов и значений параметров,
+    списки (?, ?, ...) и многострочные VALUES сворачиваются, пробелы схлопываются.
+    Запросы, отличающиеся только значениями, получают одинаковый отпечаток.
+    """
+    normalized = _COMMENTS.sub(" ", query)
+    normalized = _STRINGS.sub("?", normalized)
+    normalized = _PARAMS.sub("?", normalized)
+    normalized = _NUMBERS.sub("?", normalized)
+    normalized = _LISTS.sub("(...)", normalized)
+    normalized = _VALUES.sub(r"\1", normalized)
+    return _SPACES.sub(" ", normalized).strip().lower()
+
+
+class _FingerprintStats:
+    __slots__ = ("query", "calls", "total", "max", "rows", "errors", "recent")
+
+    def __init__(self, query: str, window: int):
+        self.query = query
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.recent: deque[float] = deque(maxlen=window)   # последние длительности для p95
+
+
+class QueryStats:
+    """
+    Накопительная статистика запросов по отпечаткам: число вызовов, суммарное, среднее,
+    максимальное и p95 время (по последним window вызовам), число возвращённых строк и ошибок.
+    Число отпечатков ограничено max_fingerprints (новые сверх лимита не учитываются).
+    """
+
+    def __init__(self, window: int = 1000, max_fingerprints: int = 1000):
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        self._stats: dict[str, _FingerprintStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, query: str, duration: float, rows: int = 0, error: bool = False) -> str:
+        """Учитывает выполнение запроса; возвращает его отпечаток"""
+        key = fingerprint(query)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    return key
+                stats = self._stats[key] = _FingerprintStats(key, self.window)
+            stats.calls += 1
+            stats.total += duration
+            stats.max = max(stats.max, duration)
+            stats.rows += rows
+            stats.errors += int(error)
+            stats.recent.append(duration)
+        return key
+
+    def snapshot(self, order_by: str = "total_ms", limit: int = 50) -> list[dict]:
+        """Статистика по отпечаткам, отсортированная по убыванию order_by"""
+        with self._lock:
+            items = [(stats, sorted(stats.recent)) for stats in self._stats.values()]
+
+        result = []
+        for stats, recent in items:
+            p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+            result.append({
+                "fingerprint": stats.query,
+                "calls": stats.calls,
+                "total_ms": round(stats.total * 1000, 3),
+                "mean_ms": round(stats.total / stats.calls * 1000, 3) if stats.calls else 0.0,
+                "p95_ms": round(p95 * 1000, 3),
+                "max_ms": round(stats.max * 1000, 3),
+                "rows": stats.rows,
+                "errors": stats.errors,
+            })
+        result.sort(key=lambda item: item.get(order_by, 0), reverse=True)
+        return result[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+# Общая статистика запросов процесса
+query_stats = QueryStats()
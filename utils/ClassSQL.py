@@ -1,35 +1,84 @@
-from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.exc import (
+    SQLAlchemyError, DBAPIError, IntegrityError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+import asyncpg
+import asyncio
+import inspect
 import logging
+import re
+import time
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
 from functools import wraps
 from utils.ClassError import AppException, ErrorHandler
+from utils.ClassException import ServiceUnavailable
+from utils.ClassMetrics import metrics
+from utils.ClassQueryStats import QueryStats, query_stats
 
 
 logger = logging.getLogger(__name__)
 
+# Максимум параметров в одном запросе (ограничение протокола PostgreSQL)
+MAX_QUERY_PARAMS = 32767
+
+db_operation_seconds = metrics.histogram(
+    "db_operation_seconds", "Время выполнения операций с БД, сек", ["operation"]
+)
+db_operation_errors = metrics.counter(
+    "db_operation_errors_total", "Ошибки операций с БД", ["operation"]
+)
+
+# Ошибки соединения с репликой: реплика исключается из ротации, чтение повторяется на primary
+REPLICA_FAILURES = (OperationalError, InterfaceError, PoolTimeoutError, OSError, asyncio.TimeoutError)
+
+# Метка в session.info: в сессии были записи, дальнейшие чтения — только с primary
+PRIMARY_PINNED = "primary_pinned"
+# Метка в session.info: реплика, на которой выполнено последнее чтение сессии (нет — primary)
+READ_REPLICA = "read_replica"
+# SQLSTATE read_only_sql_transaction: запрос с побочными эффектами в транзакции только для чтения
+READ_ONLY_VIOLATION = "25006"
+
+# Именованный параметр :name (но не приведение типа ::type)
+_NAMED_PARAM = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
 
 def db_operation(context: str = "DB"):
     """
     Декоратор для безопасной работы с БД.
     Ожидает, что функция принимает аргумент db: AsyncSession.
     Автоматически выполняет rollback при ошибках и логирует через ErrorHandler (если задан).
+    Время выполнения и ошибки пишутся в метрики с меткой operation=context,
+    а сам запрос — в статистику по отпечаткам (если у объекта есть _record_query).
+    Асинхронные генераторы (потоковое чтение) оборачиваются stream_operation.
     """
     def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            return stream_operation(func, context)
+        signature = inspect.signature(func)
+
         @wraps(func)
         async def wrapper(self, *args, **kwargs):
-            db: AsyncSession | None = kwargs.get("db")
+            arguments = signature.bind_partial(self, *args, **kwargs).arguments
+            db: AsyncSession | None = arguments.get("db")
             handler: ErrorHandler | None = getattr(self, "error_handler", None)
+            start = time.perf_counter()
+            result = None
+            failed = True
 
             try:
-                return await func(self, *args, **kwargs)
+                result = await func(self, *args, **kwargs)
+                failed = False
+                return result
 
             except IntegrityError as e:
+                db_operation_errors.inc(operation=context)
                 if db:
                     try:
                         await db.rollback()
                     except Exception as rb_err:
-                        logger.warning(f"Ошибка при rollback после IntegrityError: {rb_err}")
+                        logger.warning("Ошибка при rollback после IntegrityError: %s", rb_err)
                 if handler:
                     await handler.handle_client_error(e, context=context)
                 raise AppException(
@@ -38,12 +87,36 @@ def db_operation(context: str = "DB"):
                     original_exc=e,
                 ) from e
 
-            except SQLAlchemyError as e:
+            except asyncpg.IntegrityConstraintViolationError as e:
+                # ошибки запросов, выполненных напрямую через asyncpg (run_named, run_copy)
+                db_operation_errors.inc(operation=context)
                 if db:
                     try:
                         await db.rollback()
                     except Exception as rb_err:
-                        logger.warning(f"Ошибка при rollback после SQLAlchemyError: {rb_err}")
+                        logger.warning("Ошибка при rollback после IntegrityConstraintViolationError: %s", rb_err)
+                if handler:
+                    await handler.handle_client_error(e, context=context)
+                raise AppException(
+                    "Ошибка работы с базой данных (конфликт данных)",
+                    status_code=400,
+                    original_exc=e,
+                ) from e
+
+            except PoolTimeoutError as e:
+                # соединение из пула не получено за pool_timeout — перегрузка, а не ошибка запроса
+                db_operation_errors.inc(operation=context)
+                if handler:
+                    await handler.handle_client_error(e, context=context)
+                raise ServiceUnavailable("Нет свободных соединений с базой данных") from e
+
+            except (SQLAlchemyError, asyncpg.PostgresError) as e:
+                db_operation_errors.inc(operation=context)
+                if db:
+                    try:
+                        await db.rollback()
+                    except Exception as rb_err:
+                        logger.warning("Ошибка при rollback после SQLAlchemyError: %s", rb_err)
                 if handler:
                     await handler.handle_client_error(e, context=context)
                 raise AppException(
@@ -53,11 +126,12 @@ def db_operation(context: str = "DB"):
                 ) from e
 
             except Exception as e:
+                db_operation_errors.inc(operation=context)
                 if db:
                     try:
                         await db.rollback()
                     except Exception as rb_err:
-                        logger.warning(f"Ошибка при rollback после Exception: {rb_err}")
+                        logger.warning("Ошибка при rollback после Exception: %s", rb_err)
                 if handler:
                     await handler.handle_client_error(e, context=context)
                 raise AppException(
@@ -66,16 +140,349 @@ def db_operation(context: str = "DB"):
                     original_exc=e,
                 ) from e
 
+            finally:
+                duration = time.perf_counter() - start
+                db_operation_seconds.observe(duration, operation=context)
+                record_query = getattr(self, "_record_query", None)
+                if record_query:
+                    record_query(db, arguments, duration, result, failed)
+
         return wrapper
     return decorator
 
 
+def stream_operation(func, context: str):
+    """
+    Учёт потокового чтения (асинхронный генератор частей строк) в метриках и статистике запросов.
+    Время — только ожидание частей от БД, без времени, пока клиент читает отданную часть;
+    строки — сумма длин частей. Закрытие генератора до конца (клиент отключился) ошибкой не считается.
+    """
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        arguments = signature.bind_partial(self, *args, **kwargs).arguments
+        chunks = func(self, *args, **kwargs)
+        duration = 0.0
+        rows = 0
+        failed = True
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    duration += time.perf_counter() - start
+                rows += len(chunk)
+                yield chunk
+            failed = False
+        except GeneratorExit:
+            failed = False
+            raise
+        except Exception:
+            db_operation_errors.inc(operation=context)
+            raise
+        finally:
+            await chunks.aclose()
+            db_operation_seconds.observe(duration, operation=context)
+            record_query = getattr(self, "_record_query", None)
+            if record_query:
+                record_query(arguments.get("db"), arguments, duration, rows, failed)
+
+    return wrapper
+
+
+def _count_rows(result, arguments: dict) -> int:
+    """Количество строк в результате операции DBQueries"""
+    if result is None:
+        return 0
+    if arguments.get("return_id") or arguments.get("mode") in ("scalar", "mappings_first", "one_or_none", "first"):
+        return 1
+    if isinstance(result, int):
+        return max(result, 0)
+    try:
+        return len(result)
+    except TypeError:
+        return 1
+
+
+class StatementRegistry:
+    """
+    Реестр именованных запросов для горячих путей.
+    SQL компилируется один раз при регистрации (:name -> $n), а на каждом соединении asyncpg
+    запрос готовится (prepare) один раз и хранится в ограниченном LRU-кэше этого соединения.
+    """
+
+    def __init__(self, cache_size: int = 64):
+        self.cache_size = cache_size
+        self._statements: dict[str, tuple[str, str, list[str]]] = {}  # name -> (query, sql, params)
+        self._prepared: WeakKeyDictionary = WeakKeyDictionary()    # соединение -> OrderedDict
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def register(self, name: str, query: str) -> None:
+        """Регистрирует запрос с именованными параметрами (:name) под именем name"""
+        param_names: list[str] = []
+
+        def replace(match: re.Match) -> str:
+            param = match.group(1)
+            if param not in param_names:
+                param_names.append(param)
+            return f"${param_names.index(param) + 1}"
+
+        self._statements[name] = (query, _NAMED_PARAM.sub(replace, query), param_names)
+
+    def query(self, name: str) -> str:
+        """Исходный текст зарегистрированного запроса"""
+        return self._get(name)[0]
+
+    def is_read_only(self, name: str) -> bool:
+        """Запрос только читает данные (SELECT) и может выполняться на реплике"""
+        return self._get(name)[0].lstrip().lower().startswith("select")
+
+    def names(self, read_only: bool = False) -> list[str]:
+        """Имена зарегистрированных запросов (read_only — только SELECT, для реплик)"""
+        return [name for name in self._statements if not read_only or self.is_read_only(name)]
+
+    def args(self, name: str, params: dict | None = None) -> list:
+        """Позиционные аргументы для prepared statement из словаря параметров"""
+        params = params or {}
+        return [params[param] for param in self._get(name)[2]]
+
+    async def prepare(self, connection, name: str):
+        """Prepared statement запроса name на соединении asyncpg (из кэша или новый)"""
+        cache: OrderedDict | None = self._prepared.get(connection)
+        if cache is None:
+            cache = self._prepared[connection] = OrderedDict()
+
+        statement = cache.get(name)
+        if statement is not None:
+            cache.move_to_end(name)
+            self.hits += 1
+            return statement
+
+        self.misses += 1
+        statement = await connection.prepare(self._get(name)[1])
+        cache[name] = statement
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+            self.evictions += 1
+        return statement
+
+    def discard(self, connection, name: str) -> None:
+        """Удаляет statement из кэша соединения (например, после смены схемы)"""
+        cache = self._prepared.get(connection)
+        if cache is not None:
+            cache.pop(name, None)
+
+    def stats(self) -> dict:
+        """Счётчики кэша prepared statements"""
+        return {
+            "statements": len(self._statements),
+            "connections": len(self._prepared),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _get(self, name: str) -> tuple[str, str, list[str]]:
+        try:
+            return self._statements[name]
+        except KeyError:
+            raise AppException(f"Неизвестный именованный запрос: {name}", status_code=500)
+
+
 class DBQueries:
     """Класс с методами для безопасной работы с базой данных (CRUD-операции)."""
 
-    def __init__(self, error_handler: ErrorHandler):
+    def __init__(
+        self,
+        error_handler: ErrorHandler,
+        statements: StatementRegistry | None = None,
+        stats: QueryStats | None = None,
+        slow_query_ms: float | None = None,
+        slow_query_logger: logging.Logger | None = None,
+        explain_slow_queries: bool = False,
+        explain_interval: float = 300.0,
+    ):
         self.error_handler = error_handler
         self.logger = logging.getLogger(__name__)
+        self.statements = statements or StatementRegistry()
+        self.stats = stats or query_stats
+        self.slow_query_ms = slow_query_ms          # порог медленного запроса, мс (None — не логировать)
+        self.slow_query_logger = slow_query_logger or self.logger
+        self.explain_slow_queries = explain_slow_queries    # EXPLAIN (ANALYZE, BUFFERS) для медленных SELECT
+        self.explain_interval = explain_interval    # не чаще раза в N секунд на отпечаток
+        self._explained: dict[str, float] = {}
+        self._explain_tasks: set[asyncio.Task] = set()
+
+
+    def _record_query(self, db: AsyncSession | None, arguments: dict, duration: float, result, failed: bool) -> None:
+        """Учитывает запрос в статистике по отпечаткам и пишет медленные запросы в slow-query лог"""
+        try:
+            query = self._query_text(arguments)
+            if query is None:
+                return
+            query_fingerprint = self.stats.record(
+                query, duration, rows=_count_rows(result, arguments), error=failed
+            )
+            if failed or self.slow_query_ms is None or duration * 1000 < self.slow_query_ms:
+                return
+
+            params = arguments.get("params") or {}
+            self.slow_query_logger.warning(
+                "Медленный запрос %.1f мс: %s | параметры: %s",
+                duration * 1000, query_fingerprint, {key: "<redacted>" for key in params},
+            )
+            if self.explain_slow_queries and db is not None and query_fingerprint.startswith("select"):
+                now = time.monotonic()
+                if now - self._explained.get(query_fingerprint, float("-inf")) >= self.explain_interval:
+                    self._explained[query_fingerprint] = now
+                    # план строится там же, где выполнялся запрос: на реплике, если чтение ушло на неё
+                    engine = db.info.get(READ_REPLICA) or db.bind
+                    task = asyncio.get_running_loop().create_task(
+                        self._explain(engine, query, params, query_fingerprint)
+                    )
+                    self._explain_tasks.add(task)
+                    task.add_done_callback(self._explain_tasks.discard)
+        except Exception as e:
+            self.logger.warning("Не удалось учесть запрос в статистике: %s", e)
+
+
+    def _query_text(self, arguments: dict) -> str | None:
+        """Текст запроса операции (для статистики по отпечаткам)"""
+        if arguments.get("query"):
+            return arguments["query"]
+        if arguments.get("name"):
+            return self.statements.query(arguments["name"])
+        if arguments.get("table") and arguments.get("rows"):
+            columns = ", ".join(arguments["rows"][0].keys())
+            return f"INSERT INTO {arguments['table']} ({columns}) VALUES (...)"
+        if arguments.get("table") and arguments.get("columns"):
+            return f"COPY {arguments['table']} ({', '.join(arguments['columns'])})"
+        return None
+
+
+    async def _explain(self, engine, query: str, params: dict, query_fingerprint: str) -> None:
+        """
+        План медленного SELECT на отдельном соединении: EXPLAIN (ANALYZE, BUFFERS) выполняет запрос
+        в откатываемой транзакции только для чтения. Запросы с побочными эффектами (nextval, изменяющие CTE)
+        в ней не выполняются — для них строится план без выполнения (EXPLAIN).
+        """
+        try:
+            async with engine.connect() as conn:
+                transaction = await conn.begin()
+                try:
+                    await conn.execute(text("SET TRANSACTION READ ONLY"))
+                    result = await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {query}"), params)
+                except DBAPIError as e:
+                    if getattr(e.orig, "sqlstate", None) != READ_ONLY_VIOLATION:
+                        raise
+                    await transaction.rollback()
+                    transaction = await conn.begin()
+                    result = await conn.execute(text(f"EXPLAIN {query}"), params)
+                plan = "\n".join(row[0] for row in result)
+                await transaction.rollback()
+            self.slow_query_logger.warning("План медленного запроса %s:\n%s", query_fingerprint, plan)
+        except Exception as e:
+            self.slow_query_logger.warning("Не удалось получить план запроса %s: %s", query_fingerprint, e)
+
+
+    @staticmethod
+    def _pin_primary(db: AsyncSession) -> None:
+        """Отмечает запись в сессии: чтения после неё идут на primary (read-after-write)"""
+        db.info[PRIMARY_PINNED] = True
+
+
+    async def _route_read(self, db: AsyncSession, use_primary: bool, operation):
+        """
+        Выполняет чтение operation(bind_arguments) на реплике из session.info["replicas"].
+        На primary, если реплик нет, все исключены, задан use_primary или в сессии уже была запись.
+        При ошибке соединения реплика исключается, а чтение повторяется на primary.
+        """
+        router = db.info.get("replicas")
+        replica = None
+        if router is not None and not use_primary and not db.info.get(PRIMARY_PINNED):
+            replica = router.pick()
+
+        if replica is not None:
+            try:
+                result = await operation({"bind": replica.sync_engine})
+                db.info[READ_REPLICA] = replica
+                return result
+            except REPLICA_FAILURES as e:
+                router.eject(replica, e)
+                # в сессии ещё не было записей — откат затрагивает только чтения
+                await db.rollback()
+
+        db.info.pop(READ_REPLICA, None)
+        return await operation(None)
+
+
+    @db_operation(context="DB_NAMED")
+    async def run_named(
+        self,
+        db: AsyncSession,
+        name: str,
+        params: dict | None = None,
+        mode: str = "mappings_all",
+        required: bool = False,
+        commit: bool = False,
+        use_primary: bool = False,
+    ):
+        """
+        Выполняет зарегистрированный запрос как prepared statement на соединении сессии (asyncpg),
+        минуя конвейер выполнения SQLAlchemy.
+        Поддерживает режимы: scalar, scalars_all, mappings_first, mappings_all (строки — dict).
+        Если транзакция сессии уже начата, запрос выполняется в ней; иначе — в autocommit.
+        Запросы SELECT идут на реплику (если use_primary не задан), остальные — на primary.
+        """
+        args = self.statements.args(name, params)
+        if self.statements.is_read_only(name):
+            driver = await self._route_read(
+                db, use_primary, lambda bind_arguments: self._driver_connection(db, bind_arguments)
+            )
+        else:
+            self._pin_primary(db)
+            driver = await self._driver_connection(db)
+
+        try:
+            data = await self._fetch_named(driver, name, args, mode)
+        except asyncpg.InvalidCachedStatementError:
+            # схема изменилась (например, после миграции): statement готовится заново.
+            # Повтор возможен только вне транзакции — в ней ошибка уже прервала транзакцию
+            self.statements.discard(driver, name)
+            if driver.is_in_transaction():
+                raise
+            data = await self._fetch_named(driver, name, args, mode)
+
+        if commit and driver.is_in_transaction():
+            await db.commit()
+
+        if required and not data:
+            raise AppException("Пустой результат запроса", status_code=404)
+
+        return data
+
+
+    async def _fetch_named(self, driver, name: str, args: list, mode: str):
+        """Выполняет подготовленный на соединении запрос name в режиме выборки run_named"""
+        statement = await self.statements.prepare(driver, name)
+        match mode:
+            case "scalar":
+                return await statement.fetchval(*args)
+            case "scalars_all":
+                return [row[0] for row in await statement.fetch(*args)]
+            case "mappings_first":
+                row = await statement.fetchrow(*args)
+                return dict(row) if row is not None else None
+            case "mappings_all":
+                return [dict(row) for row in await statement.fetch(*args)]
+            case _:
+                raise AppException(f"Неизвестный режим выборки: {mode}", status_code=400)
 
 
     @db_operation(context="DB_SELECT")
@@ -86,33 +493,83 @@ class DBQueries:
         params: dict | None = None,
         mode: str = "mappings_all",
         required: bool = False,
+        use_primary: bool = False,
     ):
         """
         Выполняет SELECT-запрос.
         Поддерживает режимы: scalar, scalars_all, mappings_first, mappings_all, one_or_none, first
+        По умолчанию выполняется на реплике (если они настроены); use_primary=True — только на primary
+        (например, для nextval или чтения сразу после записи в другой сессии).
         """
-        result = await db.execute(text(query), params or {})
+        result = await self._route_read(
+            db, use_primary,
+            lambda bind_arguments: db.execute(text(query), params or {}, bind_arguments=bind_arguments),
+        )
+        data = self._fetch(result, mode)
 
+        if required and not data:
+            raise AppException("Пустой результат запроса", status_code=404)
+
+        return data
+
+
+    @staticmethod
+    def _fetch(result, mode: str):
+        """Извлекает данные из результата запроса в заданном режиме"""
         match mode:
             case "scalar":
-                data = result.scalar()
+                return result.scalar()
             case "scalars_all":
-                data = result.scalars().all()
+                return result.scalars().all()
             case "mappings_first":
-                data = result.mappings().first()
+                return result.mappings().first()
             case "mappings_all":
-                data = result.mappings().all()
+                return result.mappings().all()
             case "one_or_none":
-                data = result.one_or_none()
+                return result.one_or_none()
             case "first":
-                data = result.first()
+                return result.first()
             case _:
                 raise AppException(f"Неизвестный режим выборки: {mode}", status_code=400)
 
-        if required and not data:
-            raise AppException("Пустой результат запроса", status_code=404)
 
-        return data
+    @db_operation(context="DB_STREAM")
+    async def run_stream(
+        self,
+        db: AsyncSession,
+        query: str,
+        params: dict | None = None,
+        chunk_size: int = 1000,
+        use_primary: bool = False,
+    ):
+        """
+        Выполняет SELECT через серверный курсор (AsyncSession.stream).
+        Асинхронный генератор: отдаёт строки частями по chunk_size (списки mappings),
+        поэтому в памяти одновременно находится не больше одной части.
+        Как и run_select, по умолчанию читает с реплики.
+        """
+        try:
+            result = await self._route_read(
+                db, use_primary,
+                lambda bind_arguments: db.stream(
+                    text(query), params or {},
+                    execution_options={"yield_per": chunk_size},
+                    bind_arguments=bind_arguments,
+                ),
+            )
+            try:
+                async for chunk in result.mappings().partitions(chunk_size):
+                    yield chunk
+            finally:
+                await result.close()
+
+        except SQLAlchemyError as e:
+            await self.error_handler.handle_client_error(e, context="DB_STREAM")
+            raise AppException(
+                "Ошибка работы с базой данных",
+                status_code=500,
+                original_exc=e,
+            ) from e
 
 
     @db_operation(context="DB_UPDATE")
@@ -122,12 +579,19 @@ class DBQueries:
         query: str,
         params: dict | None = None,
         commit: bool = True,
+        mode: str | None = None,
     ):
-        """Выполняет UPDATE-запрос и возвращает количество изменённых строк."""
+        """
+        Выполняет UPDATE-запрос и возвращает количество изменённых строк.
+        Если задан mode (для запросов с RETURNING) — возвращает строки в этом режиме,
+        как run_select (например, mappings_first: None, если ничего не обновлено).
+        """
+        self._pin_primary(db)
         result = await db.execute(text(query), params or {})
+        data = self._fetch(result, mode) if mode else result.rowcount
         if commit:
             await db.commit()
-        return result.rowcount
+        return data
 
 
     @db_operation(context="DB_INSERT")
@@ -138,20 +602,128 @@ class DBQueries:
         params: dict | None = None,
         commit: bool = True,
         return_id: bool = False,
+        mode: str | None = None,
     ):
         """
         Выполняет INSERT-запрос.
         Если используется RETURNING id — можно вернуть вставленный ID.
+        Если задан mode (например, RETURNING * и mappings_first) — возвращает строки в этом режиме.
         """
+        self._pin_primary(db)
         result = await db.execute(text(query), params or {})
-        if commit:
-            await db.commit()
 
         if return_id:
             inserted_id = result.scalar()
-            return inserted_id if inserted_id is not None else 0
+            data = inserted_id if inserted_id is not None else 0
+        elif mode:
+            data = self._fetch(result, mode)
+        else:
+            data = result.rowcount
 
-        return result.rowcount
+        if commit:
+            await db.commit()
+        return data
+
+
+    @db_operation(context="DB_INSERT_MANY")
+    async def run_insert_many(
+        self,
+        db: AsyncSession,
+        table: str,
+        rows: list[dict],
+        returning: str | None = None,
+        commit: bool = True,
+    ):
+        """
+        Многострочный INSERT ... VALUES (...), (...) одним запросом на пачку строк.
+        Колонки берутся из ключей первой строки.
+        С returning (например, "*" или "id, status") возвращает список mappings в порядке вставки,
+        иначе — количество вставленных строк.
+        """
+        if not rows:
+            return [] if returning else 0
+
+        self._pin_primary(db)
+        columns = list(rows[0].keys())
+        # ограничение протокола PostgreSQL на число параметров в одном запросе
+        chunk_size = max(1, MAX_QUERY_PARAMS // len(columns))
+        inserted = []
+        rowcount = 0
+
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            params = {}
+            values = []
+            for i, row in enumerate(chunk):
+                placeholders = []
+                for column in columns:
+                    params[f"{column}_{i}"] = row[column]
+                    placeholders.append(f":{column}_{i}")
+                values.append(f"({', '.join(placeholders)})")
+
+            query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join(values)}"
+            if returning:
+                query += f" RETURNING {returning}"
+
+            result = await db.execute(text(query), params)
+            if returning:
+                inserted.extend(result.mappings().all())
+            else:
+                rowcount += result.rowcount
+
+        if commit:
+            await db.commit()
+        return inserted if returning else rowcount
+
+
+    @db_operation(context="DB_COPY")
+    async def run_copy(
+        self,
+        db: AsyncSession,
+        table: str,
+        columns: list[str],
+        records: list[tuple],
+        commit: bool = True,
+    ):
+        """
+        Массовая вставка через COPY (asyncpg copy_records_to_table) на соединении сессии.
+        Если транзакция сессии ещё не начата, COPY выполняется в собственной транзакции.
+        Возвращает количество вставленных строк.
+        """
+        if not records:
+            return 0
+
+        self._pin_primary(db)
+        driver = await self._driver_connection(db)
+        if driver.is_in_transaction():
+            status = await driver.copy_records_to_table(table, records=records, columns=columns)
+            if commit:
+                await db.commit()
+        else:
+            async with driver.transaction():
+                status = await driver.copy_records_to_table(table, records=records, columns=columns)
+
+        # asyncpg возвращает статус вида "COPY 500"
+        return int(status.split()[-1])
+
+
+    async def begin(self, db: AsyncSession) -> None:
+        """
+        Начинает транзакцию сессии на primary, если она ещё не начата: run_named и run_copy
+        выполняются в ней до db.commit(), а не в autocommit
+        """
+        self._pin_primary(db)
+        driver = await self._driver_connection(db)
+        if not driver.is_in_transaction():
+            # транзакцию драйвера SQLAlchemy открывает при первом запросе через сессию
+            await db.execute(text("SELECT 1"))
+
+
+    async def _driver_connection(self, db: AsyncSession, bind_arguments: dict | None = None):
+        """Нативное соединение asyncpg, на котором работает сессия (для bind_arguments — реплики)"""
+        connection = await db.connection(bind_arguments=bind_arguments)
+        raw = await connection.get_raw_connection()
+        return raw.driver_connection
 
 
     @db_operation(context="DB_DELETE")
@@ -163,6 +735,7 @@ class DBQueries:
         commit: bool = True,
     ):
         """Выполняет DELETE-запрос и возвращает количество удалённых строк."""
+        self._pin_primary(db)
         result = await db.execute(text(query), params or {})
         if commit:
             await db.commit()
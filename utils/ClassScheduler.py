@@ -0,0 +1,68 @@
+from typing import Awaitable, Callable
+import asyncio
+import logging
+import time
+
+from utils.ClassMetrics import metrics
+
+
+job_runs = metrics.counter("background_job_runs_total", "Запуски фоновых задач", ["job", "result"])
+job_seconds = metrics.histogram(
+    "background_job_duration_seconds", "Длительность запуска фоновой задачи, сек", ["job"],
+    buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0),
+)
+
+
+class PeriodicJob:
+    """
+    Фоновая задача, которая вызывает func раз в interval секунд в текущем event loop.
+    Ошибка запуска пишется в лог и не останавливает задачу; первый запуск — через delay секунд.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Awaitable],
+        interval: float,
+        delay: float = 0.0,
+        logger: logging.Logger | None = None,
+    ):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.delay = delay
+        self.logger = logger or logging.getLogger(__name__)
+        self._task: asyncio.Task | None = None
+
+    async def run_once(self) -> None:
+        """Один запуск с учётом в метриках; исключения не пробрасываются"""
+        start = time.perf_counter()
+        try:
+            await self.func()
+            job_runs.inc(job=self.name, result="ok")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            job_runs.inc(job=self.name, result="error")
+            self.logger.exception("Ошибка фоновой задачи %s", self.name)
+        finally:
+            job_seconds.observe(time.perf_counter() - start, job=self.name)
+
+    async def _run(self) -> None:
+        await asyncio.sleep(self.delay)
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
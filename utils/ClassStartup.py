@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+import logging
+import time
+
+from utils.ClassMetrics import metrics
+
+
+startup_phase_seconds = metrics.gauge("startup_phase_seconds", "Длительность фаз старта процесса, сек", ["phase"])
+
+
+class StartupTimer:
+    """
+    Замер фаз старта процесса. Фазы могут выполняться параллельно (asyncio.gather),
+    поэтому общее время считается от создания таймера, а не суммой фаз.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+
+    def _record(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+        startup_phase_seconds.set(seconds, phase=name)
+
+    def since_start(self, name: str) -> None:
+        """Фаза от создания таймера до текущего момента (например, импорт модулей)"""
+        self._record(name, time.perf_counter() - self.started)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - start)
+
+    def report(self, logger: logging.Logger) -> None:
+        """Итоговая строка лога: общее время и длительность каждой фазы"""
+        total = time.perf_counter() - self.started
+        startup_phase_seconds.set(total, phase="total")
+        logger.info(
+            "Старт завершён за %.3f с (%s)",
+            total, ", ".join(f"{name} {seconds:.3f} с" for name, seconds in self.phases.items()),
+        )
@@ -46,8 +46,8 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
     # --- Логируем событие ---
     logger.warning(
-        f"Ошибка валидации входных данных: {errors} | "
-        f"URL: {request.url.path} | Метод: {request.method}"
+        "Ошибка валидации входных данных: %s | URL: %s | Метод: %s",
+        errors, request.url.path, request.method
     )
 
     # --- Формируем унифицированный ответ ---